@@ -1,14 +1,19 @@
 import streamlit as st
 from azure.cognitiveservices.vision.computervision import ComputerVisionClient
-from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
 from azure.cognitiveservices.vision.face import FaceClient
 from msrest.authentication import CognitiveServicesCredentials
-from azure.storage.blob import BlobServiceClient
-import time
-from PIL import Image
-import io
+import os
+import sys
 import base64
 
+# Shared storage backend (Azure, or a local directory for offline runs) from ../Rnn
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Rnn"))
+from storage_backend import get_blob_service_client
+from ocr_client import OcrError, ReadOcrClient
+from image_ingest import READ_LIMITS, IngestedImage
+from container_manifest import ContainerManifest
+from face_service import FaceService
+
 # Set the title of the browser tab
 st.set_page_config(page_title="Azure AI - OCR & Face Detection", page_icon="🧑‍💻")
 
@@ -19,15 +24,38 @@ AZURE_ENDPOINT = "YOUR_AZURE_ENDPOINT"
 FACE_API_KEY = "YOUR_FACE_API_KEY"
 FACE_API_ENDPOINT = "YOUR_FACE_API_ENDPOINT"
 STORAGE_CONNECTION_STRING = "YOUR_STORAGE_CONNECTION_STRING"
+MANIFEST_TTL_S = 60  # How long cached container/blob listings are reused
 # Azure clients
 computervision_client = ComputerVisionClient(AZURE_ENDPOINT, CognitiveServicesCredentials(AZURE_KEY))
-blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+blob_service_client = get_blob_service_client(STORAGE_CONNECTION_STRING)
 face_client = FaceClient(FACE_API_ENDPOINT, CognitiveServicesCredentials(FACE_API_KEY))
 
+# One face service per session, kept in session_state (st.cache_resource would share it,
+# and its pre-filter counters, with every session in the process); it survives reruns
+# (FACE_DETECTION_MODE=remote|local|hybrid, see face_service.py)
+if "face_service" not in st.session_state:
+    st.session_state.face_service = FaceService(face_client)
+face_service = st.session_state.face_service
+
+# One OCR client (and its thread pool) per process, shared by every session and rerun;
+# st.cache_resource is process-wide, not per session
+@st.cache_resource
+def get_ocr_client():
+    return ReadOcrClient(computervision_client, max_in_flight=8)
+
+ocr_client = get_ocr_client()
+
+# Container and blob listings cached across reruns of this session, so reruns and
+# duplicate checks don't go back to storage (see container_manifest.py)
+if "manifest" not in st.session_state:
+    st.session_state.manifest = ContainerManifest(blob_service_client, ttl_s=MANIFEST_TTL_S)
+manifest = st.session_state.manifest
+round_trips_at_start = sum(manifest.round_trips.values())
+
 # Function to fetch all containers
 def fetch_containers():
     try:
-        return [container.name for container in blob_service_client.list_containers()]
+        return manifest.containers()
     except Exception as e:
         st.error(f"Error fetching containers: {e}")
         return []
@@ -35,9 +63,7 @@ def fetch_containers():
 # Function to create a new container
 def create_new_container(container_name):
     try:
-        container_client = blob_service_client.get_container_client(container_name)
-        if not container_client.exists():
-            container_client.create_container()
+        if manifest.create_container(container_name):
             return True
         else:
             st.warning(f"Container '{container_name}' already exists.")
@@ -46,70 +72,46 @@ def create_new_container(container_name):
         st.error(f"Error creating new container: {e}")
         return False
 
+# Function to check whether a blob already exists (a lookup in the cached manifest)
+def blob_exists(container_name, blob_name):
+    try:
+        return manifest.exists(container_name, blob_name)
+    except Exception as e:
+        st.error(f"Error checking blob existence: {e}")
+        return False
+
 # Function to upload file to blob
 def upload_to_blob(container_name, blob_name, image_data):
     try:
-        container_client = blob_service_client.get_container_client(container_name)
-        container_client.upload_blob(blob_name, image_data)
+        manifest.upload(container_name, blob_name, image_data)
         return True
     except Exception as e:
         st.error(f"Error uploading blob: {e}")
         return False
 
 # Function for OCR using Azure Computer Vision
+# (adaptive polling and concurrent jobs, see ocr_client.py)
 def perform_ocr(image_data):
     try:
-        response = computervision_client.read_in_stream(image_data, language="en", raw=True)
-        operation_location = response.headers["Operation-Location"]
-        operation_id = operation_location.split("/")[-1]
-
-        # Poll for the OCR result
-        while True:
-            result = computervision_client.get_read_result(operation_id)
-            if result.status not in ['notStarted', 'running']:
-                break
-            time.sleep(1)
-
-        if result.status == OperationStatusCodes.succeeded:
-            text = []
-            for page in result.analyze_result.read_results:
-                for line in page.lines:
-                    text.append(line.text)
-            return text
-        else:
-            st.error("OCR processing failed.")
-            return None
+        return ocr_client.read_one(image_data)
+    except OcrError as e:
+        st.error(f"OCR processing failed: {e}")
+        return None
     except Exception as e:
         st.error(f"Error during OCR: {e}")
         return None
 
 # Function for face detection using Azure Face API
-def detect_faces(image_data):
+# `image` is an IngestedImage; the faces are cropped from the already decoded original
+def detect_faces(image):
     try:
-        detected_faces = face_client.face.detect_with_stream(
-            image=image_data,
-            return_face_id=False,
-            return_face_landmarks=False,
-            return_face_attributes=None
-        )
-
-        if not detected_faces:
+        boxes = face_service.detect(image)
+
+        if not boxes:
             st.warning("No faces detected in the image. 😞")
             return None
 
-        image = Image.open(image_data)
-        faces = []
-
-        for face in detected_faces:
-            rect = face.face_rectangle
-            left, top, width, height = rect.left, rect.top, rect.width, rect.height
-            box = (left, top, left + width, top + height)
-
-            # Crop face from the image
-            face_image = image.crop(box)
-            faces.append(face_image)
-
-        return faces
+        return face_service.crop(image, boxes)
     except Exception as e:
         st.error(f"Error during face detection: {e}")
         return None
@@ -155,6 +157,7 @@ with col2:
     st.markdown("Select an Existing Container 📦")
     existing_containers = fetch_containers()
 
+    selected_container = None
     if existing_containers:
         selected_container = st.selectbox("Choose an existing container:", existing_containers)
         st.write(f"Selected container: {selected_container}")
@@ -174,17 +177,13 @@ with col2:
     # File upload section
     uploaded_file = st.file_uploader("Upload an Image 🖼️", type=["jpg", "png", "jpeg"])
     if uploaded_file:
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Image", use_column_width=True)
-
-        # Save image in-memory for processing and uploading
-        image_bytes = io.BytesIO()
-        image.save(image_bytes, format="JPEG")
-        image_bytes.seek(0)
+        # Decoded once and shared by the preview, OCR, face detection and upload
+        image = IngestedImage.from_upload(uploaded_file)
+        st.image(image.image, caption="Uploaded Image", use_column_width=True)
 
         # OCR Section
         if st.button("Perform OCR 📝"):
-            ocr_result = perform_ocr(image_bytes)
+            ocr_result = perform_ocr(image.for_service(*READ_LIMITS)[0])
             if ocr_result:
                 st.write("Extracted Text: 🗣️")
                 for line in ocr_result:
@@ -192,48 +191,32 @@ with col2:
 
         # Face Detection Section
         if st.button("Detect Faces 👤"):
-            faces = detect_faces(image_bytes)
+            faces = detect_faces(image)
             if faces:
                 st.write("Detected Faces: 😍")
                 for idx, face in enumerate(faces):
                     st.image(face, caption=f"Face {idx + 1}", use_column_width=True)
+            if face_service.mode != "remote":
+                st.caption(face_service.summary())
 
         # Upload to Azure Blob Storage Section
         if st.button("Upload to Azure Blob Storage ☁️"):
             if selected_container:  # Use selected_container for uploading to the chosen container
                 # Check if the image already exists in the selected container
-                blob_exists = False
-                try:
-                    # Check if the blob exists by getting its properties
-                    blob_service_client.get_container_client(selected_container).get_blob_client(uploaded_file.name).get_blob_properties()
-                    blob_exists = True
-                except Exception as e:
-                    if "404 Client Error" not in str(e):
-                        st.error(f"Error checking blob existence: {e}")
-                
-                if blob_exists:
+                if blob_exists(selected_container, uploaded_file.name):
                     st.warning(f"Image '{uploaded_file.name}' already exists in container '{selected_container}'. 🚫")
                 else:
                     # Upload the image if it doesn't exist
-                    if upload_to_blob(selected_container, uploaded_file.name, image_bytes.getvalue()):
+                    if upload_to_blob(selected_container, uploaded_file.name, image.data):
                         st.success(f"Image '{uploaded_file.name}' uploaded to container '{selected_container}'. 📤")
                         
             elif new_container_name:  # If the user creates a new container, upload there
                 # Check if the image already exists in the new container
-                blob_exists = False
-                try:
-                    # Check if the blob exists by getting its properties
-                    blob_service_client.get_container_client(new_container_name).get_blob_client(uploaded_file.name).get_blob_properties()
-                    blob_exists = True
-                except Exception as e:
-                    if "404 Client Error" not in str(e):
-                        st.error(f"Error checking blob existence: {e}")
-                
-                if blob_exists:
+                if blob_exists(new_container_name, uploaded_file.name):
                     st.warning(f"Image '{uploaded_file.name}' already exists in new container '{new_container_name}'. 🚫")
                 else:
                     # Upload the image if it doesn't exist
-                    if upload_to_blob(new_container_name, uploaded_file.name, image_bytes.getvalue()):
+                    if upload_to_blob(new_container_name, uploaded_file.name, image.data):
                         st.success(f"Image '{uploaded_file.name}' uploaded to new container '{new_container_name}'. 📤")
                         
             else:
@@ -244,8 +227,7 @@ with col2:
     # Show updated container contents
     if st.button("Show Container Contents 📂"):
         try:
-            container_client = blob_service_client.get_container_client(selected_container)
-            blobs = [blob.name for blob in container_client.list_blobs()]
+            blobs = sorted(manifest.blobs(selected_container))
             if blobs:
                 st.write("Container Contents: 📋")
                 for blob in blobs:
@@ -254,3 +236,10 @@ with col2:
                 st.write("No files in container. 🚫")
         except Exception as e:
             st.error(f"Error listing container contents: {e}")
+
+    # Refresh the cached listings (e.g. after changes made outside this app)
+    if st.button("Refresh Listings 🔄"):
+        manifest.invalidate()
+        st.rerun()
+
+    st.caption(f"Storage round-trips this interaction: {sum(manifest.round_trips.values()) - round_trips_at_start}")
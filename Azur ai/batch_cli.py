@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Rnn"))
+from image_ingest import READ_LIMITS, IngestedImage
+
+# Headless batch mode: OCR -> face detection -> upload for every image in a folder
+#
+#   python batch_cli.py scans/ --container archive --output results.jsonl
+#   python batch_cli.py scans/ --container archive --output results.parquet --faces-concurrency 2
+#
+# The stages run as an asyncio pipeline connected by bounded queues, each with its own
+# concurrency limit (and thread pool for the synchronous SDK calls), so a slow stage
+# throttles the ones before it instead of piling images up in memory. Every finished
+# image is appended to a JSONL log and its path to a checkpoint file; a re-run skips
+# checkpointed images, so an interrupted batch resumes where it stopped. Failed images
+# go to <output>.errors.jsonl and are retried on the next run. With a .parquet output
+# the JSONL log is converted at the end (needs pyarrow).
+#
+# Credentials come from the environment: AZURE_VISION_ENDPOINT, AZURE_VISION_KEY,
+# FACE_API_ENDPOINT, FACE_API_KEY and STORAGE_CONNECTION_STRING (or BLOB_STORAGE_URL
+# for the local storage backend). With --face-mode local no Face API key is needed;
+# hybrid only calls the Face API for images where the local cascade finds a candidate.
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+_DONE = object()
+
+# Relative paths (with "/" separators) of the images under `input_dir`, in a stable order
+def iter_images(input_dir, extensions=IMAGE_EXTENSIONS):
+    for directory, subdirectories, files in os.walk(input_dir):
+        subdirectories.sort()
+        for file_name in sorted(files):
+            if file_name.lower().endswith(extensions):
+                yield os.path.relpath(os.path.join(directory, file_name), input_dir).replace(os.sep, "/")
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failures = 0
+        self.busy_s = 0.0
+
+    def report(self, elapsed_s):
+        mean_ms = self.busy_s * 1000.0 / self.items if self.items else 0.0
+        rate = self.items / elapsed_s if elapsed_s else 0.0
+        return (f"{self.name:<8} {self.items:>7} items  {self.failures:>5} failed  {rate:8.2f} items/s  "
+                f"{mean_ms:9.1f} ms/item")
+
+# Run `fn(record)` on every record from `inbox` with `workers` concurrent tasks
+#
+# Records that already failed in an earlier stage are passed on untouched. The end of
+# the input (_DONE) is forwarded once all workers have stopped.
+async def run_stage(stats, fn, inbox, outbox, workers):
+    async def worker():
+        while True:
+            record = await inbox.get()
+            if record is _DONE:
+                await inbox.put(_DONE)  # Let the sibling workers see it too
+                return
+            if fn is not None and "error" not in record:
+                started = time.perf_counter()
+                try:
+                    await fn(record)
+                except Exception as e:
+                    record["error"] = f"{stats.name}: {e}"
+                    stats.failures += 1
+                stats.busy_s += time.perf_counter() - started
+                stats.items += 1
+            await outbox.put(record)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    await outbox.put(_DONE)
+
+def _public(record):
+    return {key: value for key, value in record.items() if not key.startswith("_")}
+
+# Every column a record can have; stages that were skipped leave theirs null
+def parquet_schema():
+    import pyarrow as pa
+
+    face = pa.struct([("left", pa.int64()), ("top", pa.int64()), ("right", pa.int64()), ("bottom", pa.int64()),
+                      ("crop_path", pa.string())])
+    return pa.schema([
+        ("path", pa.string()),
+        ("bytes", pa.int64()),
+        ("width", pa.int64()),
+        ("height", pa.int64()),
+        ("ocr_lines", pa.list_(pa.string())),
+        ("faces", pa.list_(face)),
+        ("uploaded", pa.string()),
+        ("etag", pa.string()),
+    ])
+
+# Convert the JSONL log to Parquet, keeping the last record per path
+#
+# The schema is explicit: inferred from the first row, columns that only later rows have
+# (e.g. after resuming with --skip-ocr dropped) would be lost.
+def write_parquet(jsonl_path, parquet_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    records = {}
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records[record["path"]] = record
+    pq.write_table(pa.Table.from_pylist(list(records.values()), schema=parquet_schema()), parquet_path)
+    return len(records)
+
+async def run_batch(input_dir, log_path, checkpoint_path, ocr=None, face_service=None, manifest=None,
+                    container=None, load_concurrency=4, ocr_concurrency=8, faces_concurrency=4,
+                    upload_concurrency=8, queue_size=32, crops_dir=None, limit=None):
+    loop = asyncio.get_running_loop()
+    done = load_checkpoint(checkpoint_path)
+    pools = {
+        "load": ThreadPoolExecutor(load_concurrency, thread_name_prefix="load"),
+        "faces": ThreadPoolExecutor(faces_concurrency, thread_name_prefix="faces"),
+        "upload": ThreadPoolExecutor(upload_concurrency, thread_name_prefix="upload"),
+    }
+    stats = {name: StageStats(name) for name in ("load", "ocr", "faces", "upload")}
+
+    def load_sync(record):
+        with open(os.path.join(input_dir, record["path"]), "rb") as f:
+            image = IngestedImage(f.read(), record["path"])
+        # Decode and make the OCR-sized version here, off the event loop
+        record["_ocr_payload"] = image.for_service(*READ_LIMITS)[0]
+        record["_image"] = image
+        record["bytes"] = len(image.data)
+        record["width"], record["height"] = image.image.size
+
+    async def load(record):
+        await loop.run_in_executor(pools["load"], load_sync, record)
+
+    async def recognize(record):
+        record["ocr_lines"] = await ocr.read(record.pop("_ocr_payload"))
+
+    def faces_sync(record):
+        image = record["_image"]
+        boxes = face_service.detect(image)
+        record["faces"] = [dict(zip(("left", "top", "right", "bottom"), box)) for box in boxes]
+        if crops_dir:
+            stem = record["path"].rsplit(".", 1)[0].replace("/", "__")
+            for index, crop in enumerate(face_service.crop(image, boxes)):
+                crop_path = os.path.join(crops_dir, f"{stem}_face{index}.png")
+                crop.save(crop_path)
+                record["faces"][index]["crop_path"] = crop_path
+
+    async def faces(record):
+        await loop.run_in_executor(pools["faces"], faces_sync, record)
+
+    def upload_sync(record):
+        image = record["_image"]
+        if manifest.exists(container, image.name):
+            record["uploaded"] = "exists"
+            record["etag"] = manifest.blobs(container)[image.name]
+        else:
+            record["etag"] = manifest.upload(container, image.name, image.data).get("etag")
+            record["uploaded"] = "uploaded"
+
+    async def upload(record):
+        await loop.run_in_executor(pools["upload"], upload_sync, record)
+
+    if crops_dir:
+        os.makedirs(crops_dir, exist_ok=True)
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in range(5)]
+    stages = [
+        run_stage(stats["load"], load, queues[0], queues[1], load_concurrency),
+        run_stage(stats["ocr"], recognize if ocr is not None else None, queues[1], queues[2], ocr_concurrency),
+        run_stage(stats["faces"], faces if face_service is not None else None, queues[2], queues[3],
+                  faces_concurrency),
+        run_stage(stats["upload"], upload if manifest is not None else None, queues[3], queues[4],
+                  upload_concurrency),
+    ]
+
+    async def produce():
+        queued = 0
+        for path in iter_images(input_dir):
+            if path in done:
+                continue
+            if limit is not None and queued >= limit:
+                break
+            await queues[0].put({"path": path})
+            queued += 1
+        await queues[0].put(_DONE)
+
+    counts = {"succeeded": 0, "failed": 0, "skipped": len(done)}
+
+    # Results first, then the checkpoint: a crash in between repeats an image instead of losing it
+    async def write():
+        errors_path = log_path + ".errors.jsonl"
+        with open(log_path, "a", encoding="utf-8") as log, open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+                open(errors_path, "a", encoding="utf-8") as errors:
+            while True:
+                record = await queues[4].get()
+                if record is _DONE:
+                    break
+                if "error" in record:
+                    errors.write(json.dumps(_public(record)) + "\n")
+                    errors.flush()
+                    counts["failed"] += 1
+                    continue
+                log.write(json.dumps(_public(record)) + "\n")
+                log.flush()
+                checkpoint.write(record["path"] + "\n")
+                checkpoint.flush()
+                counts["succeeded"] += 1
+            os.fsync(log.fileno())
+            os.fsync(checkpoint.fileno())
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(produce(), *stages, write())
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=False)
+    counts["seconds"] = time.perf_counter() - started
+    return counts, stats
+
+# Each SDK is imported only by the stage that needs it, so e.g. --skip-ocr with
+# --face-mode local runs without the Cognitive Services packages installed
+def build_services(args):
+    ocr = face_service = manifest = None
+    if not args.skip_ocr:
+        from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+        from msrest.authentication import CognitiveServicesCredentials
+        from ocr_client import ReadOcrClient
+
+        vision = ComputerVisionClient(os.environ["AZURE_VISION_ENDPOINT"],
+                                      CognitiveServicesCredentials(os.environ["AZURE_VISION_KEY"]))
+        ocr = ReadOcrClient(vision, max_in_flight=args.ocr_concurrency)
+    if not args.skip_faces:
+        from face_service import FaceService
+
+        face_client = None
+        if args.face_mode != "local":
+            from azure.cognitiveservices.vision.face import FaceClient
+            from msrest.authentication import CognitiveServicesCredentials
+
+            face_client = FaceClient(os.environ["FACE_API_ENDPOINT"],
+                                     CognitiveServicesCredentials(os.environ["FACE_API_KEY"]))
+        face_service = FaceService(face_client, mode=args.face_mode)
+    if not args.skip_upload:
+        if not args.container:
+            raise SystemExit("--container is required unless --skip-upload is given")
+        from container_manifest import ContainerManifest
+        from storage_backend import get_blob_service_client
+
+        manifest = ContainerManifest(get_blob_service_client(os.environ.get("STORAGE_CONNECTION_STRING", "")))
+        if args.container not in manifest.containers():
+            manifest.create_container(args.container)
+    return ocr, face_service, manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch OCR, face cropping and archival for a folder of images")
+    parser.add_argument("input_dir")
+    parser.add_argument("--output", default="results.jsonl", help="results.jsonl, or results.parquet (needs pyarrow)")
+    parser.add_argument("--checkpoint", default=None, help="Default: <output>.checkpoint")
+    parser.add_argument("--container", default=None, help="Blob container to archive the images in")
+    parser.add_argument("--crops-dir", default=None, help="Also save face crops as PNG files here")
+    parser.add_argument("--load-concurrency", type=int, default=4)
+    parser.add_argument("--ocr-concurrency", type=int, default=8)
+    parser.add_argument("--faces-concurrency", type=int, default=4)
+    parser.add_argument("--upload-concurrency", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=32, help="Images buffered between two stages")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most N new images")
+    parser.add_argument("--face-mode", choices=["remote", "local", "hybrid"],
+                        default=os.environ.get("FACE_DETECTION_MODE", "remote"))
+    parser.add_argument("--skip-ocr", action="store_true")
+    parser.add_argument("--skip-faces", action="store_true")
+    parser.add_argument("--skip-upload", action="store_true")
+    args = parser.parse_args(argv)
+
+    parquet = args.output.endswith(".parquet")
+    log_path = args.output[:-len(".parquet")] + ".jsonl" if parquet else args.output
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    ocr, face_service, manifest = build_services(args)
+
+    counts, stats = asyncio.run(run_batch(
+        args.input_dir, log_path, checkpoint_path, ocr, face_service, manifest, args.container,
+        args.load_concurrency, args.ocr_concurrency, args.faces_concurrency, args.upload_concurrency,
+        args.queue_size, args.crops_dir, args.limit))
+
+    print(f"{counts['succeeded']} images processed, {counts['failed']} failed, "
+          f"{counts['skipped']} already done (checkpoint) in {counts['seconds']:.1f}s")
+    for stage in stats.values():
+        print("  " + stage.report(counts["seconds"]))
+    if face_service is not None:
+        print(f"  faces: {face_service.summary()}")
+    if counts["failed"]:
+        print(f"Failures logged to {log_path}.errors.jsonl; they are retried on the next run")
+
+    if parquet:
+        try:
+            rows = write_parquet(log_path, args.output)
+            print(f"Wrote {rows} rows to {args.output}")
+        except ImportError:
+            print(f"pyarrow is not installed; results are in {log_path}")
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
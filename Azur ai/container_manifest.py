@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import Counter
+from azure.core.exceptions import ResourceExistsError
+
+# Cached view of the storage account: container names and a name -> etag index per container
+#
+# A container's index is built by one paged list_blobs pass and reused until it is
+# older than `ttl_s`; uploads made through the manifest update it in place, so
+# "does this blob exist?" is a dict lookup instead of a get_blob_properties call whose
+# 404 has to be told apart from real errors. Every request sent to storage is counted
+# in `round_trips` (by kind), so the app can show what an interaction cost.
+
+class ContainerManifest:
+    def __init__(self, blob_service_client, ttl_s=60.0):
+        self.client = blob_service_client
+        self.ttl_s = ttl_s
+        self.round_trips = Counter()
+        self._containers = None  # (loaded_at, [names])
+        self._blobs = {}         # container -> (loaded_at, {name: etag})
+        self._lock = threading.RLock()
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at < self.ttl_s
+
+    # Paged SDK listings cost one round trip per page; plain lists (local backend) one in total
+    def _pages(self, kind, listing):
+        pages = listing.by_page() if hasattr(listing, "by_page") else [listing]
+        for page in pages:
+            self.round_trips[kind] += 1
+            yield page
+
+    def containers(self, refresh=False):
+        with self._lock:
+            if refresh or self._containers is None or not self._fresh(self._containers[0]):
+                names = [container.name for page in self._pages("list_containers", self.client.list_containers())
+                         for container in page]
+                self._containers = (time.monotonic(), names)
+            return list(self._containers[1])
+
+    # {blob name: etag} for a container, from cache while it is fresh
+    def blobs(self, container_name, refresh=False):
+        with self._lock:
+            cached = self._blobs.get(container_name)
+            if refresh or cached is None or not self._fresh(cached[0]):
+                container_client = self.client.get_container_client(container_name)
+                index = {blob.name: blob.etag for page in self._pages("list_blobs", container_client.list_blobs())
+                         for blob in page}
+                cached = (time.monotonic(), index)
+                self._blobs[container_name] = cached
+            return cached[1]
+
+    def exists(self, container_name, blob_name):
+        return blob_name in self.blobs(container_name)
+
+    # Create a container; returns False when it already exists
+    def create_container(self, container_name):
+        with self._lock:
+            if container_name in self.containers():
+                return False
+            self.round_trips["create_container"] += 1
+            try:
+                self.client.create_container(container_name)
+            except ResourceExistsError:
+                return False
+            finally:
+                self._containers = None
+            self._blobs[container_name] = (time.monotonic(), {})
+            return True
+
+    # Upload a blob and record it in the container's index
+    def upload(self, container_name, blob_name, data, overwrite=False):
+        self.round_trips["upload_blob"] += 1
+        blob_client = self.client.get_container_client(container_name).get_blob_client(blob_name)
+        result = blob_client.upload_blob(data, overwrite=overwrite) or {}
+        with self._lock:
+            cached = self._blobs.get(container_name)
+            if cached is not None:
+                cached[1][blob_name] = result.get("etag")
+        return result
+
+    def invalidate(self, container_name=None):
+        with self._lock:
+            if container_name is None:
+                self._containers = None
+                self._blobs.clear()
+            else:
+                self._blobs.pop(container_name, None)
+
+# Duplicate checks for a batch of uploads: get_blob_properties per file vs. the manifest
+#
+#   python container_manifest.py --blobs 2000 --checks 200 --latency-ms 20
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+    import tempfile
+    from azure.core.exceptions import ResourceNotFoundError
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Rnn"))
+    from storage_backend import LocalBlobServiceClient
+
+    parser = argparse.ArgumentParser(description="Per-upload existence probes vs. a cached container manifest")
+    parser.add_argument("--blobs", type=int, default=2000)
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        service = LocalBlobServiceClient(scratch)
+        container_client = service.create_container("images")
+        for i in range(args.blobs):
+            container_client.upload_blob(f"image_{i:05d}.jpg", b"x")
+        service.latency_s = args.latency_ms / 1000.0
+        # Every other name is missing, so both the found and the 404 paths are checked
+        names = [f"image_{i % args.blobs:05d}.jpg" if i % 2 == 0 else f"missing_{i:05d}.jpg"
+                 for i in range(args.checks)]
+
+        before = service.requests
+        started = time.perf_counter()
+        probed = 0
+        for name in names:
+            try:
+                container_client.get_blob_client(name).get_blob_properties()
+                probed += 1
+            except ResourceNotFoundError:
+                pass
+        probe_s = time.perf_counter() - started
+        probe_requests = service.requests - before
+
+        manifest = ContainerManifest(service)
+        before = service.requests
+        started = time.perf_counter()
+        found = sum(manifest.exists("images", name) for name in names)
+        manifest_s = time.perf_counter() - started
+        manifest_requests = service.requests - before
+
+        manifest.upload("images", "new.jpg", b"y")
+        assert manifest.exists("images", "new.jpg") and service.requests - before == manifest_requests + 1
+        assert found == probed == (args.checks + 1) // 2, (found, probed)
+        print(f"get_blob_properties probes: {probe_s * 1000:8.1f} ms, {probe_requests} round trips")
+        print(f"container manifest:         {manifest_s * 1000:8.1f} ms, {manifest_requests} round trips "
+              f"(counted: {dict(manifest.round_trips)})")
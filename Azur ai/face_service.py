@@ -0,0 +1,140 @@
+import io
+import os
+import threading
+from collections import Counter
+import cv2
+import numpy as np
+from image_ingest import FACE_LIMITS
+
+# Face detection shared by the Streamlit app and the batch CLI
+#
+# Kept free of Streamlit so it can run headless. Works on IngestedImage objects: the
+# Face API gets a version of the image within its limits, and the boxes it returns
+# are mapped back to the coordinates of the original image.
+#
+# FACE_DETECTION_MODE picks where faces are found:
+#   remote  every image goes to the Azure Face API (default)
+#   local   OpenCV Haar cascade only, no network; enough when only boxes/crops are needed
+#   hybrid  the cascade runs first as a pre-filter and images without a face candidate
+#           skip the Face API call; images with candidates still get the remote boxes
+# The cascade is the same haarcascade_frontalface_default.xml the Haar cascade projects
+# use, tuned for recall (it only has to rule images out in hybrid mode).
+#
+# cv2 is imported here rather than on first use: the first `import cv2` from several
+# detector threads at once races and can see a half-initialised module.
+
+MODES = ("remote", "local", "hybrid")
+DEFAULT_MODE = os.environ.get("FACE_DETECTION_MODE", "remote")
+CASCADE_PATH = os.environ.get("FACE_CASCADE_PATH")
+LOCAL_MAX_SIDE = 1024  # The cascade runs on a copy downscaled to this size
+
+class FaceService:
+    def __init__(self, face_client=None, mode=DEFAULT_MODE, cascade_path=CASCADE_PATH, scale_factor=1.1,
+                 min_neighbors=3, min_size=(24, 24)):
+        if mode not in MODES:
+            raise ValueError(f"Unknown face detection mode '{mode}', expected one of {MODES}")
+        if mode != "local" and face_client is None:
+            raise ValueError(f"Face detection mode '{mode}' needs a Face API client")
+        self.face_client = face_client
+        self.mode = mode
+        self.cascade_path = cascade_path or os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        # remote_calls, remote_calls_avoided, local_detections, local_empty
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # One CascadeClassifier per thread: it is not thread-safe
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _classifier(self):
+        classifier = getattr(self._local, "classifier", None)
+        if classifier is None:
+            classifier = cv2.CascadeClassifier(self.cascade_path)
+            if classifier.empty():
+                raise RuntimeError(f"Could not load the face cascade at {self.cascade_path}")
+            self._local.classifier = classifier
+        return classifier
+
+    # Face candidates from the Haar cascade, in original image coordinates
+    def detect_local(self, image):
+        gray = np.asarray(image.image.convert("L"))
+        scale = min(1.0, LOCAL_MAX_SIDE / max(gray.shape))
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(gray.shape[1] * scale), int(gray.shape[0] * scale)),
+                              interpolation=cv2.INTER_AREA)
+        faces = self._classifier().detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                    minNeighbors=self.min_neighbors, minSize=self.min_size)
+        self._count("local_detections")
+        boxes = [tuple(int(round(value / scale)) for value in (x, y, x + w, y + h)) for (x, y, w, h) in faces]
+        if not boxes:
+            self._count("local_empty")
+        return boxes
+
+    # Face boxes from the Azure Face API, in original image coordinates
+    def detect_remote(self, image):
+        face_data, scale = image.for_service(*FACE_LIMITS)
+        self._count("remote_calls")
+        detected_faces = self.face_client.face.detect_with_stream(
+            image=io.BytesIO(face_data),
+            return_face_id=False,
+            return_face_landmarks=False,
+            return_face_attributes=None
+        )
+        boxes = []
+        for face in detected_faces or []:
+            rect = face.face_rectangle
+            box = (rect.left, rect.top, rect.left + rect.width, rect.top + rect.height)
+            boxes.append(tuple(int(round(value / scale)) for value in box))
+        return boxes
+
+    # Face boxes (left, top, right, bottom) in original image coordinates
+    def detect(self, image):
+        if self.mode == "remote":
+            return self.detect_remote(image)
+        candidates = self.detect_local(image)
+        if self.mode == "local" or not candidates:
+            self._count("remote_calls_avoided")
+            return candidates
+        return self.detect_remote(image)
+
+    # Crop the faces out of the already decoded original
+    def crop(self, image, boxes):
+        return [image.crop(box) for box in boxes]
+
+    def summary(self):
+        return (f"{self.counters['remote_calls']} Face API calls, "
+                f"{self.counters['remote_calls_avoided']} avoided by the local pre-filter "
+                f"({self.counters['local_detections']} local detections, "
+                f"{self.counters['local_empty']} without a face candidate)")
+
+# Run the local cascade over a folder to see how many Face API calls hybrid mode would save
+#
+#   python face_service.py photos/
+if __name__ == "__main__":
+    import argparse
+    import time
+    from image_ingest import IngestedImage
+
+    parser = argparse.ArgumentParser(description="Local Haar cascade pre-filter over a folder of images")
+    parser.add_argument("input_dir")
+    args = parser.parse_args()
+
+    service = FaceService(mode="local")
+    started = time.perf_counter()
+    images = 0
+    for directory, _, files in os.walk(args.input_dir):
+        for file_name in sorted(files):
+            if not file_name.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")):
+                continue
+            with open(os.path.join(directory, file_name), "rb") as f:
+                boxes = service.detect(IngestedImage(f.read(), file_name))
+            images += 1
+            print(f"{file_name}: {len(boxes)} face candidate(s)")
+    elapsed = time.perf_counter() - started
+    if images:
+        print(f"{images} images, {elapsed * 1000.0 / images:.1f} ms/image locally; hybrid mode would skip the "
+              f"Face API for {service.counters['local_empty']} of them")
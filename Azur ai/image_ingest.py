@@ -0,0 +1,152 @@
+import io
+import threading
+import numpy as np
+from PIL import Image
+
+# Decode-once image buffer shared by OCR, face detection and upload
+#
+# The uploaded file's encoded bytes are kept as they are: uploads send them unchanged
+# and every consumer that wants a stream gets its own BytesIO over them (CPython shares
+# the buffer until someone writes, so this is not a copy) or a memoryview. The image is
+# decoded at most once, on first use, and a downscaled re-encode that fits a service's
+# limits is made at most once per limit and cached.
+
+# (max bytes, max width/height) accepted by the services
+READ_LIMITS = (4 * 1024 * 1024, 10000)  # Computer Vision Read (free tier size limit)
+FACE_LIMITS = (6 * 1024 * 1024, 4096)   # Face API detect
+
+class IngestedImage:
+    def __init__(self, data, name=None):
+        self.data = bytes(data)
+        self.name = name
+        self._decoded = None
+        self._array = None
+        self._service_versions = {}
+        self._lock = threading.Lock()
+        self.decodes = 0  # How often the encoded bytes were decoded (stays at 0 or 1)
+
+    # From a Streamlit UploadedFile (or any object with getvalue()/read() and a name)
+    @classmethod
+    def from_upload(cls, uploaded_file):
+        data = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+        return cls(data, getattr(uploaded_file, "name", None))
+
+    # Zero-copy view of the original encoded bytes
+    @property
+    def view(self):
+        return memoryview(self.data)
+
+    # A fresh stream over the original bytes, positioned at 0, for one consumer
+    def reader(self):
+        return io.BytesIO(self.data)
+
+    @property
+    def image(self):
+        with self._lock:
+            if self._decoded is None:
+                decoded = Image.open(self.reader())
+                decoded.load()
+                self.decodes += 1
+                self._decoded = decoded
+        return self._decoded
+
+    # Decoded pixels as a read-only numpy array (H, W[, C])
+    @property
+    def array(self):
+        if self._array is None:
+            array = np.asarray(self.image)
+            array.flags.writeable = False
+            self._array = array
+        return self._array
+
+    @property
+    def format(self):
+        return self.image.format
+
+    # Encoded bytes that satisfy a service's (max_bytes, max_side) limits, and the factor
+    # that maps their coordinates back to the original image (1.0 when unchanged)
+    #
+    # The original bytes are used when they already fit; otherwise the decoded image is
+    # downscaled and re-encoded as JPEG once, and the result is cached per limit.
+    def for_service(self, max_bytes, max_side):
+        key = (max_bytes, max_side)
+        if key in self._service_versions:
+            return self._service_versions[key]
+        width, height = self.image.size
+        if len(self.data) <= max_bytes and max(width, height) <= max_side:
+            version = (self.data, 1.0)
+        else:
+            version = self._downscale(max_bytes, max_side)
+        self._service_versions[key] = version
+        return version
+
+    def _downscale(self, max_bytes, max_side, quality=85):
+        width, height = self.image.size
+        scale = min(1.0, max_side / max(width, height))
+        source = self.image if self.image.mode in ("RGB", "L") else self.image.convert("RGB")
+        while True:
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            resized = source if scale == 1.0 else source.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            buffer = io.BytesIO()
+            resized.save(buffer, format="JPEG", quality=quality)
+            if buffer.tell() <= max_bytes or min(size) <= 1:
+                return buffer.getvalue(), size[0] / width
+            # Encoded size grows roughly with the pixel count, so shrink both sides by the
+            # square root of the overshoot (with a margin) instead of stepping blindly
+            scale *= 0.9 * (max_bytes / buffer.tell()) ** 0.5
+
+    # Crop a box given in the coordinates of a service version back from the original
+    def crop(self, box, scale=1.0):
+        left, top, right, bottom = (int(round(value / scale)) for value in box)
+        return self.image.crop((left, top, right, bottom))
+
+# Old flow vs. IngestedImage for one upload going to OCR, face detection and storage
+#
+#   python image_ingest.py                                   # 12 MP phone-style JPEG
+#   python image_ingest.py --width 6000 --height 4000 --format PNG
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Decode/encode work per upload: old flow vs. IngestedImage")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "PNG"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (args.height // 8, args.width // 8, 3), dtype=np.uint8)
+    source = Image.fromarray(pixels).resize((args.width, args.height))
+    upload = io.BytesIO()
+    source.save(upload, format=args.format)
+    upload = upload.getvalue()
+
+    # Old flow: decode, re-encode to JPEG, decode again for face cropping, copy for upload
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(upload))
+    image_bytes = io.BytesIO()
+    image.save(image_bytes, format="JPEG")
+    image_bytes.seek(0)
+    ocr_payload = image_bytes.read()
+    image_bytes.seek(0)
+    face_payload_old = image_bytes.read()
+    Image.open(image_bytes).crop((10, 10, 200, 200))
+    upload_payload = image_bytes.getvalue()
+    old_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ingested = IngestedImage(upload, "upload.png")
+    ocr_payload, _ = ingested.for_service(*READ_LIMITS)
+    face_payload, scale = ingested.for_service(*FACE_LIMITS)
+    ingested.crop((10, 10, 200, 200), scale)
+    ingested.for_service(*FACE_LIMITS)  # Cached: no second resize
+    upload_payload = ingested.data
+    new_s = time.perf_counter() - started
+
+    assert ingested.decodes == 1
+    assert upload_payload is ingested.data, "upload should send the original bytes without copying"
+    print(f"{args.width}x{args.height} {args.format}, {len(upload) / 1e6:.1f} MB")
+    print(f"old flow:      {old_s * 1000:8.1f} ms (2 decodes, {len(face_payload_old) / 1e6:.1f} MB sent to each "
+          f"service regardless of limits)")
+    print(f"IngestedImage: {new_s * 1000:8.1f} ms (1 decode, face version {len(face_payload) / 1e6:.1f} MB "
+          f"at scale {scale:.2f})")
@@ -0,0 +1,236 @@
+import asyncio
+import email.utils
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrent client for the Azure Computer Vision Read (OCR) API
+#
+# A Read call is asynchronous on the service side: read_in_stream submits a job and
+# get_read_result is polled until it finishes. Instead of sleeping a fixed second per
+# poll, the first poll comes after `initial_interval_s` and the interval grows by
+# `backoff` up to `max_interval_s`; a Retry-After header from the service takes
+# precedence. Throttled submits (429/503) are retried the same way.
+#
+# The SDK is synchronous, so its calls run in a thread pool and are awaited from
+# asyncio. A threading.BoundedSemaphore caps the jobs in flight at `max_in_flight` for
+# the whole process: the Streamlit app shares one client between sessions, and each
+# session runs its own event loop (asyncio primitives can't be shared between loops).
+
+PENDING_STATUSES = ("notStarted", "running")
+RETRY_STATUS_CODES = (429, 503)
+
+class OcrError(Exception):
+    pass
+
+# Seconds from a Retry-After header (delta-seconds or HTTP date), or None
+def parse_retry_after(headers):
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def _status(result):
+    return getattr(result.status, "value", result.status)
+
+def _lines(result):
+    return [line.text for page in result.analyze_result.read_results for line in page.lines]
+
+class ReadOcrClient:
+    def __init__(self, computervision_client, max_in_flight=8, language="en", initial_interval_s=0.1,
+                 max_interval_s=2.0, backoff=2.0, timeout_s=120.0, max_submit_retries=5):
+        self.client = computervision_client
+        self.max_in_flight = max_in_flight
+        self.language = language
+        self.initial_interval_s = initial_interval_s
+        self.max_interval_s = max_interval_s
+        self.backoff = backoff
+        self.timeout_s = timeout_s
+        self.max_submit_retries = max_submit_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="ocr")
+        # Waiting for a slot blocks a thread, so it gets its own pool: the SDK calls of the
+        # jobs holding the slots must never queue behind it
+        self._waiters = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="ocr-wait")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self.polls = 0  # get_read_result calls so far, to compare polling strategies
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    # Submit a job and return its operation id, retrying while the service throttles
+    async def _submit(self, image_bytes):
+        delay = self.initial_interval_s
+        for attempt in range(self.max_submit_retries + 1):
+            try:
+                # A fresh stream per attempt: the SDK consumes it
+                response = await self._call(self.client.read_in_stream, io.BytesIO(image_bytes),
+                                            language=self.language, raw=True)
+                return response.headers["Operation-Location"].split("/")[-1]
+            except Exception as e:
+                response = getattr(e, "response", None)
+                status_code = getattr(response, "status_code", None)
+                if status_code not in RETRY_STATUS_CODES or attempt == self.max_submit_retries:
+                    raise
+                retry_after = parse_retry_after(getattr(response, "headers", None))
+                await asyncio.sleep(retry_after if retry_after is not None else delay)
+                delay = min(delay * self.backoff, self.max_interval_s)
+
+    # Take one of the process-wide in-flight slots without blocking the event loop
+    async def _acquire_slot(self):
+        if self._slots.acquire(blocking=False):
+            return
+        abandoned = threading.Event()
+
+        def wait():
+            while not self._slots.acquire(timeout=0.1):
+                if abandoned.is_set():
+                    return False
+            if abandoned.is_set():
+                self._slots.release()
+                return False
+            return True
+
+        waiting = self._waiters.submit(wait)
+        try:
+            await asyncio.wrap_future(waiting)
+        except BaseException:
+            # Cancelled (e.g. the session's loop shut down): give back a slot taken meanwhile
+            abandoned.set()
+            waiting.add_done_callback(lambda f: not f.cancelled() and f.result() and self._slots.release())
+            raise
+
+    # OCR one image (bytes or a file-like object); returns its text lines
+    async def read(self, image_data):
+        image_bytes = image_data.read() if hasattr(image_data, "read") else bytes(image_data)
+        await self._acquire_slot()
+        try:
+            operation_id = await self._submit(image_bytes)
+            deadline = time.monotonic() + self.timeout_s
+            delay = self.initial_interval_s
+            while True:
+                await asyncio.sleep(delay)
+                raw = await self._call(self.client.get_read_result, operation_id, raw=True)
+                self.polls += 1
+                result = raw.output
+                if _status(result) not in PENDING_STATUSES:
+                    break
+                if time.monotonic() > deadline:
+                    raise OcrError(f"OCR operation {operation_id} did not finish within {self.timeout_s}s")
+                retry_after = parse_retry_after(getattr(raw.response, "headers", None))
+                delay = retry_after if retry_after is not None else min(delay * self.backoff, self.max_interval_s)
+        finally:
+            self._slots.release()
+
+        if _status(result) != "succeeded":
+            raise OcrError(f"OCR operation {operation_id} ended with status '{_status(result)}'")
+        return _lines(result)
+
+    # OCR many images concurrently; results come back in input order
+    #
+    # With return_exceptions=True a failed image yields its exception in its slot
+    # instead of failing the whole batch (same as asyncio.gather).
+    async def read_many(self, images, return_exceptions=False):
+        return await asyncio.gather(*(self.read(image) for image in images), return_exceptions=return_exceptions)
+
+    # Synchronous entry points for callers without an event loop (e.g. Streamlit)
+    def read_batch(self, images, return_exceptions=False):
+        return asyncio.run(self.read_many(images, return_exceptions))
+
+    def read_one(self, image_data):
+        return self.read_batch([image_data])[0]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._waiters.shutdown(wait=False)
+
+# Benchmark against a simulated Read service: the old submit + sleep(1) loop, one image
+# at a time, vs. ReadOcrClient
+#
+#   python ocr_client.py --images 20 --service-ms 300
+if __name__ == "__main__":
+    import argparse
+    import itertools
+
+    class _Response:
+        def __init__(self, headers):
+            self.headers = headers
+
+    class _Raw:
+        def __init__(self, output, headers=None):
+            self.output = output
+            self.response = _Response(headers or {})
+            self.headers = headers or {}
+
+    class _Line:
+        def __init__(self, text):
+            self.text = text
+
+    class _Result:
+        def __init__(self, status, text=None):
+            self.status = status
+            page = type("Page", (), {"lines": [_Line(text)]}) if text else None
+            self.analyze_result = type("Analyze", (), {"read_results": [page] if page else []})
+
+    # Jobs finish `service_ms` after submission
+    class _FakeComputerVisionClient:
+        def __init__(self, service_ms):
+            self.service_s = service_ms / 1000.0
+            self.jobs = {}
+            self.ids = itertools.count()
+            self.lock = threading.Lock()
+
+        def read_in_stream(self, image, language="en", raw=False):
+            data = image.read()
+            with self.lock:
+                operation_id = str(next(self.ids))
+                self.jobs[operation_id] = (time.monotonic() + self.service_s, data.decode())
+            return _Raw(None, {"Operation-Location": f"https://example/read/analyzeResults/{operation_id}"})
+
+        def get_read_result(self, operation_id, raw=False):
+            ready_at, text = self.jobs[operation_id]
+            if time.monotonic() < ready_at:
+                result = _Result("running")
+            else:
+                result = _Result("succeeded", text)
+            return _Raw(result) if raw else result
+
+    parser = argparse.ArgumentParser(description="Fixed 1s polling vs. adaptive concurrent OCR polling")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--service-ms", type=float, default=300.0, help="Simulated service-side processing time")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    args = parser.parse_args()
+
+    images = [f"text of image {i}".encode() for i in range(args.images)]
+
+    client = _FakeComputerVisionClient(args.service_ms)
+    started = time.perf_counter()
+    old_results = []
+    for image in images:
+        response = client.read_in_stream(io.BytesIO(image), language="en", raw=True)
+        operation_id = response.headers["Operation-Location"].split("/")[-1]
+        while True:
+            result = client.get_read_result(operation_id)
+            if result.status not in PENDING_STATUSES:
+                break
+            time.sleep(1)
+        old_results.append(_lines(result))
+    old_s = time.perf_counter() - started
+
+    ocr = ReadOcrClient(_FakeComputerVisionClient(args.service_ms), max_in_flight=args.max_in_flight)
+    started = time.perf_counter()
+    new_results = ocr.read_batch(images)
+    new_s = time.perf_counter() - started
+    ocr.close()
+
+    assert new_results == old_results, "results differ or are out of order"
+    print(f"fixed 1s polling, sequential: {old_s:6.2f}s ({args.images / old_s:6.1f} images/s)")
+    print(f"adaptive polling, concurrent: {new_s:6.2f}s ({args.images / new_s:6.1f} images/s, "
+          f"{ocr.polls / args.images:.1f} polls/image, {old_s / new_s:.1f}x)")
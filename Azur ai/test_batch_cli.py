@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from PIL import Image
+
+cv2 = pytest.importorskip("cv2")
+if not hasattr(cv2, "CascadeClassifier"):
+    pytest.skip("this OpenCV build has no CascadeClassifier", allow_module_level=True)
+
+BATCH_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_cli.py")
+
+@pytest.fixture
+def scans(tmp_path):
+    folder = tmp_path / "scans"
+    folder.mkdir()
+    for i in range(32):
+        Image.new("RGB", (320 + 8 * i, 240), (10 * i, 120, 200)).save(folder / f"scan_{i:02d}.jpg")
+    return folder
+
+# The real CLI in a fresh interpreter: local face detection, no Azure services
+def run_cli(scans, output, *flags):
+    return subprocess.run([sys.executable, BATCH_CLI, str(scans), "--output", str(output), "--skip-ocr",
+                           "--skip-upload", *flags], capture_output=True, text=True, timeout=300)
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_local_faces_with_several_threads(scans, tmp_path):
+    output = tmp_path / "results.jsonl"
+    result = run_cli(scans, output, "--face-mode", "local", "--faces-concurrency", "4")
+    assert result.returncode == 0, result.stdout + result.stderr
+    records = read_jsonl(output)
+    assert sorted(record["path"] for record in records) == sorted(os.listdir(scans))
+    assert all(record["faces"] == [] for record in records)
+    errors = str(output) + ".errors.jsonl"
+    assert not os.path.exists(errors) or not read_jsonl(errors)
+    assert "32 local detections" in result.stdout
+
+def test_parquet_keeps_columns_added_on_resume(scans, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    output = tmp_path / "results.parquet"
+    assert run_cli(scans, output, "--skip-faces", "--limit", "4").returncode == 0
+    result = run_cli(scans, output, "--face-mode", "local", "--faces-concurrency", "4")
+    assert result.returncode == 0, result.stdout + result.stderr
+    table = pq.read_table(output)
+    assert table.num_rows == 32
+    assert {"ocr_lines", "faces", "uploaded", "etag"} <= set(table.column_names)
+    assert sum(faces is not None for faces in table.column("faces").to_pylist()) == 28
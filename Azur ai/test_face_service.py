@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import textwrap
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+if not hasattr(cv2, "CascadeClassifier"):
+    pytest.skip("this OpenCV build has no CascadeClassifier", allow_module_level=True)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Threads call detect_local one after another while the first calls are still running,
+# in a fresh interpreter, the way the batch CLI's faces stage starts. Staggering them
+# over the ~0.1s cv2 takes to import is what exposed the lazy-import race.
+THREADED_DETECT = textwrap.dedent("""
+    import io
+    import threading
+    import time
+    from PIL import Image
+    from face_service import FaceService
+    from image_ingest import IngestedImage
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 240), "gray").save(buffer, "JPEG")
+    image = IngestedImage(buffer.getvalue(), "gray.jpg")
+    service = FaceService(mode="local")
+    errors, classifiers = [], []
+
+    def work():
+        try:
+            service.detect_local(image)
+            classifiers.append(service._classifier())
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=work) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert len({id(classifier) for classifier in classifiers}) == 32, "each thread needs its own classifier"
+    assert service.counters["local_detections"] == 32
+""")
+
+@pytest.mark.parametrize("attempt", range(3))
+def test_detect_local_from_many_threads_in_a_fresh_process(attempt):
+    result = subprocess.run([sys.executable, "-c", THREADED_DETECT], cwd=HERE, capture_output=True, text=True,
+                            timeout=120)
+    assert result.returncode == 0, result.stderr
+
+def test_missing_cascade_is_reported():
+    from face_service import FaceService
+
+    service = FaceService(mode="local", cascade_path=os.path.join(HERE, "missing_cascade.xml"))
+    with pytest.raises(RuntimeError):
+        service._classifier()
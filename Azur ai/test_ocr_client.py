@@ -0,0 +1,88 @@
+import asyncio
+import io
+import itertools
+import threading
+import time
+import pytest
+from ocr_client import ReadOcrClient
+
+class Raw:
+    def __init__(self, output=None, headers=None):
+        self.output = output
+        self.headers = headers or {}
+        self.response = self
+
+class Result:
+    def __init__(self, status, text=None):
+        self.status = status
+        page = type("Page", (), {"lines": [type("Line", (), {"text": text})]})
+        self.analyze_result = type("Analyze", (), {"read_results": [page] if text else []})
+
+# Read service whose jobs take `service_s`; records how many were in flight at once
+class FakeVisionClient:
+    def __init__(self, service_s=0.05):
+        self.service_s = service_s
+        self.jobs = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def read_in_stream(self, image, language="en", raw=False):
+        text = image.read().decode()
+        with self.lock:
+            operation_id = str(next(self.ids))
+            self.jobs[operation_id] = (time.monotonic() + self.service_s, text)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        return Raw(headers={"Operation-Location": f"https://example/read/analyzeResults/{operation_id}"})
+
+    def get_read_result(self, operation_id, raw=False):
+        ready_at, text = self.jobs[operation_id]
+        if time.monotonic() < ready_at:
+            return Raw(Result("running"))
+        with self.lock:
+            if self.jobs.pop(operation_id, None):
+                self.active -= 1
+        return Raw(Result("succeeded", text))
+
+@pytest.fixture
+def client():
+    vision = FakeVisionClient()
+    ocr = ReadOcrClient(vision, max_in_flight=3, initial_interval_s=0.01, max_interval_s=0.02)
+    yield vision, ocr
+    ocr.close()
+
+# Like the Streamlit app: one shared client, every session with its own asyncio.run
+def test_in_flight_cap_covers_every_event_loop(client):
+    vision, ocr = client
+    results = {}
+
+    def session(name):
+        results[name] = ocr.read_batch([f"{name} page {i}".encode() for i in range(6)])
+
+    sessions = [threading.Thread(target=session, args=(f"s{n}",)) for n in range(4)]
+    for thread in sessions:
+        thread.start()
+    for thread in sessions:
+        thread.join()
+    assert vision.max_active == 3
+    assert results["s2"] == [[f"s2 page {i}"] for i in range(6)]
+
+def test_cancelled_waiters_give_their_slot_back(client):
+    vision, ocr = client
+
+    async def cancel_some():
+        tasks = [asyncio.ensure_future(ocr.read(f"page {i}".encode())) for i in range(8)]
+        await asyncio.sleep(0.01)
+        for task in tasks[3:]:
+            task.cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(cancel_some())
+    assert results[:3] == [["page 0"], ["page 1"], ["page 2"]]
+    assert all(isinstance(result, asyncio.CancelledError) for result in results[3:])
+    # Every slot is free again
+    assert ocr.read_batch([io.BytesIO(f"again {i}".encode()) for i in range(3)]) == [[f"again {i}"] for i in range(3)]
+    time.sleep(0.2)  # Let the abandoned waiters notice
+    assert all(ocr._slots.acquire(blocking=False) for _ in range(3))
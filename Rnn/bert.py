@@ -1,117 +1,323 @@
+import time
+
+# Process start reference for the cold-start report
+PROCESS_STARTED = time.perf_counter()
+
+import os
+import json
+import threading
+from typing import List, Optional, Union
 import torch
-from transformers import BertTokenizer, BertForSequenceClassification, Trainer, TrainingArguments
-from datasets import load_dataset
-from fastapi import FastAPI
+from transformers import BertTokenizer
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import streamlit as st
 import requests
+from bert_batcher import MicroBatcher
+from bert_backends import load_backend
+from bert_longdoc import POOLING_RULES, long_document_logits
+from bert_cache import PredictionCache, model_version
+import bert_metrics as metrics
+from bert_metrics import span
+
+# Serving entry point for the fine-tuned IMDB sentiment model
+#
+#   python bert.py serve     # API only, loads ./bert_imdb_model
+#   python bert.py           # API + Streamlit frontend
+#   python bert_workers.py --workers 4   # API in N pre-forked worker processes
+#
+# Training lives in bert_train.py; importing this module never downloads or trains anything.
+
+MODEL_DIR = os.environ.get("BERT_MODEL_DIR", "./bert_imdb_model")
+
+# Inference backend: "torch" (fp32), "torch-int8" or "onnx-int8" (see bert_quantize.py export)
+BACKEND = os.environ.get("BERT_BACKEND", "torch")
+INT8_DIR = os.environ.get("BERT_INT8_DIR")  # Defaults to "<MODEL_DIR>_int8"
+
+# Long-document mode: score the whole text with overlapping 512-token windows instead
+# of truncating it, pooling window logits with LONG_DOC_POOLING ("mean", "max" or
+# "length_weighted"). Windows from every request in a micro-batch share forward passes.
+LONG_DOC_MODE = os.environ.get("BERT_LONG_DOCS", "0") == "1"
+LONG_DOC_POOLING = os.environ.get("BERT_LONG_DOC_POOLING", "mean")
+LONG_DOC_OVERLAP = int(os.environ.get("BERT_LONG_DOC_OVERLAP", "128"))
+LONG_DOC_BATCH_SIZE = int(os.environ.get("BERT_LONG_DOC_BATCH_SIZE", "16"))
+if LONG_DOC_POOLING not in POOLING_RULES:
+    raise ValueError(f"BERT_LONG_DOC_POOLING must be one of {', '.join(POOLING_RULES)}")
+
+# Prediction cache keyed by normalized text + model version (BERT_CACHE_SIZE=0 disables it)
+CACHE_SIZE = int(os.environ.get("BERT_CACHE_SIZE", "10000"))
+CACHE_TTL_S = float(os.environ.get("BERT_CACHE_TTL_S", "3600"))
+
+# Filled in by load_model(); the API answers 503 until then
+tokenizer = None
+backend = None
+model_ready = threading.Event()
+cache = PredictionCache(max_entries=CACHE_SIZE, ttl_seconds=CACHE_TTL_S)
+
+# Cold-start timings in seconds, measured from PROCESS_STARTED (hot reloads add
+# last_reload_* fields and leave these alone)
+startup_report = {"model_dir": MODEL_DIR, "backend": BACKEND}
+
+def _mark(name):
+    startup_report[name] = round(time.perf_counter() - PROCESS_STARTED, 4)
+
+_mark("imports_done_s")
 
-# Load the pre-trained BERT model and tokenizer
-tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-model = BertForSequenceClassification.from_pretrained('bert-base-uncased', num_labels=2)
-
-# Load the IMDB dataset
-dataset = load_dataset("imdb")
-
-# Tokenize the dataset
-def tokenize_function(examples):
-    return tokenizer(examples['text'], padding="max_length", truncation=True)
-
-# Apply the tokenization function to the dataset
-tokenized_datasets = dataset.map(tokenize_function, batched=True)
-
-# Define training arguments
-training_args = TrainingArguments(
-    output_dir='./results',          # Output directory
-    evaluation_strategy="epoch",     # Evaluate every epoch
-    learning_rate=2e-5,              # Learning rate for optimization
-    per_device_train_batch_size=8,   # Batch size for training
-    per_device_eval_batch_size=8,    # Batch size for evaluation
-    num_train_epochs=3,              # Number of epochs to train
-    weight_decay=0.01,               # Strength of weight decay (regularization)
-    logging_dir='./logs',            # Directory for storing logs
-    logging_steps=10,
-)
-
-# Initialize the Trainer
-trainer = Trainer(
-    model=model,                         # The model to train
-    args=training_args,                  # Training arguments
-    train_dataset=tokenized_datasets['train'],  # Training dataset
-    eval_dataset=tokenized_datasets['test'],   # Evaluation dataset
-)
-
-# Start the training process
-trainer.train()
-
-# After fine-tuning, use the model for predictions
-inputs = tokenizer(["I love this product!", "This is terrible, do not buy it."], padding=True, truncation=True, return_tensors="pt")
-
-# Ensure model is in evaluation mode
-model.eval()
-
-# Move inputs and model to the same device (e.g., CUDA if available)
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)  # Move the model to the device
-inputs = inputs.to(device)  # Move the inputs to the device
-
-# Get predictions
-with torch.no_grad():  # Use torch.no_grad() for inference
-    outputs = model(**inputs)
-    logits = outputs.logits
-
-# Convert logits to probabilities
-probs = torch.nn.functional.softmax(logits, dim=-1)  # Use softmax to get probabilities
-
-# Get predicted class (0 or 1 for binary classification)
-predictions = torch.argmax(probs, dim=-1)  # Use argmax to get the predicted class
-print(predictions)
-
-# Evaluate the model on the test set
-eval_results = trainer.evaluate()
-print(eval_results)
-
-# Save the trained model
-model.save_pretrained('./bert_imdb_model')
-tokenizer.save_pretrained('./bert_imdb_model')
-
-# Load the trained model and tokenizer for future predictions
-model = BertForSequenceClassification.from_pretrained('./bert_imdb_model')
-tokenizer = BertTokenizer.from_pretrained('./bert_imdb_model')
+# Load the trained model and tokenizer for predictions
+#
+# Also used to hot-swap a new checkpoint (reload=True): the tokenizer and backend are
+# replaced together and the prediction cache moves to the new model version. Reload
+# timings go under "last_reload_*" so the cold-start fields keep describing startup.
+def load_model(model_dir=MODEL_DIR, backend_name=BACKEND, reload=False):
+    global tokenizer, backend
+    prefix = "last_reload_" if reload else ""
+    started = time.perf_counter()
+    new_tokenizer = BertTokenizer.from_pretrained(model_dir)
+    new_backend = load_backend(backend_name, model_dir, INT8_DIR)
+    version = model_version(model_dir, backend_name, LONG_DOC_MODE, LONG_DOC_POOLING, LONG_DOC_OVERLAP)
+    tokenizer, backend = new_tokenizer, new_backend
+    cache.lowercase = getattr(tokenizer, "do_lower_case", True)
+    cache.set_version(version)
+    startup_report["model_version"] = version
+    startup_report[prefix + "model_load_s"] = round(time.perf_counter() - started, 4)
+
+    # Warm up once so the first real request doesn't pay for lazy initialisation
+    started = time.perf_counter()
+    predict_batch(["warmup"])
+    startup_report[prefix + "warmup_s"] = round(time.perf_counter() - started, 4)
+
+    if reload:
+        startup_report["reloads"] = startup_report.get("reloads", 0) + 1
+        _mark("last_reload_s")
+        print(f"Model reloaded: {startup_report}")
+        return
+    _mark("ready_s")
+    model_ready.set()
+    print(f"Model ready: {startup_report}")
+
+# Mini-batch size for bulk scoring (/predict/batch and predict())
+BULK_BATCH_SIZE = int(os.environ.get("BERT_BULK_BATCH_SIZE", "32"))
+
+# Yield (index, prediction) pairs, one padded mini-batch at a time
+#
+# Texts are sorted by length first so each mini-batch pads only to its own longest
+# text instead of the longest text in the whole call.
+def iter_predictions(texts, batch_size=BULK_BATCH_SIZE):
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        labels = predict_batch([texts[i] for i in indices])
+        yield list(zip(indices, labels))
 
 # Function to make predictions
-def predict(texts):
-    inputs = tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
-    with torch.no_grad():  # Use no_grad for inference
-        outputs = model(**inputs)
-        predictions = outputs.logits.argmax(axis=-1)
-    return predictions
+def predict(texts, batch_size=BULK_BATCH_SIZE):
+    if isinstance(texts, str):
+        texts = [texts]
+    predictions = [None] * len(texts)
+    for batch in iter_predictions(texts, batch_size):
+        for index, label in batch:
+            predictions[index] = label
+    return torch.tensor(predictions, dtype=torch.long)
+
+# Run one padded forward pass for a micro-batch of texts and return one label per text
+def predict_batch(texts):
+    if metrics.ENABLED:
+        inflight_batches.inc()
+        batch_texts.observe(len(texts))
+    try:
+        if LONG_DOC_MODE:
+            with span("long_document"):
+                logits = long_document_logits(texts, tokenizer, _timed_logits, LONG_DOC_BATCH_SIZE,
+                                              LONG_DOC_POOLING, overlap=LONG_DOC_OVERLAP)
+            return logits.argmax(axis=-1).tolist()
+        with span("tokenize"):
+            inputs = tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+        logits = _timed_logits(inputs)
+        return logits.argmax(axis=-1).tolist()
+    finally:
+        if metrics.ENABLED:
+            inflight_batches.dec()
+
+def _timed_logits(inputs):
+    with span("forward"):
+        return backend.logits(inputs)  # Backends run under no_grad / without autograd
+
+# Batching window for concurrent /predict/ requests (tune against the p99 latency target)
+MAX_BATCH_SIZE = int(os.environ.get("BERT_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.environ.get("BERT_MAX_WAIT_MS", "5"))
+
+# Record queue wait for every request of a micro-batch
+def _observe_micro_batch(size, waits):
+    for wait in waits:
+        metrics.observe("queue_wait", wait)
+
+batcher = MicroBatcher(predict_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                       observer=_observe_micro_batch if metrics.ENABLED else None)
+
+# Exported on /metrics next to the stage histogram (BERT_METRICS=0 disables all of it)
+inflight_batches = metrics.registry.register(metrics.Gauge(
+    "bert_inflight_batches", "Forward-pass batches currently running."))
+batch_texts = metrics.registry.register(metrics.Histogram(
+    "bert_batch_texts", "Texts per forward-pass batch.", buckets=(1, 2, 4, 8, 16, 32, 64, 128)))
+metrics.registry.register(metrics.Gauge(
+    "bert_queue_depth", "Requests waiting in the micro-batching queue.", fn=lambda: batcher.qsize()))
+metrics.registry.register(metrics.Counter(
+    "bert_cache_hits_total", "Prediction cache hits.", fn=lambda: cache.hits))
+metrics.registry.register(metrics.Counter(
+    "bert_cache_misses_total", "Prediction cache misses.", fn=lambda: cache.misses))
 
 # FastAPI application setup
 app = FastAPI()
 
+@app.on_event("startup")
+def start_serving():
+    batcher.start()
+    # Load in the background so /health and /ready answer while weights are read
+    if not model_ready.is_set():
+        threading.Thread(target=load_model, name="bert-model-loader", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_batcher():
+    batcher.stop()
+
 class TextRequest(BaseModel):
     text: str
 
+def _require_ready():
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still loading")
+
 @app.post("/predict/")
 def predict_api(request: TextRequest):
-    inputs = tokenizer(request.text, padding=True, truncation=True, return_tensors="pt")
-    with torch.no_grad():  # Use no_grad for inference
-        outputs = model(**inputs)
-        prediction = outputs.logits.argmax(axis=-1).item()
-    return {"prediction": prediction}
+    _require_ready()
+    with span("request"):
+        version = cache.version
+        prediction = cache.get(request.text)
+        if prediction is None:
+            # Requests arriving within the batching window share one forward pass
+            prediction = batcher.predict(request.text)
+            cache.put(request.text, prediction, version)
+        if "first_prediction_s" not in startup_report:
+            _mark("first_prediction_s")
+        with span("serialize"):
+            body = json.dumps({"prediction": prediction})
+    return Response(body, media_type="application/json")
+
+class BatchRequest(BaseModel):
+    texts: List[str]
+    ids: Optional[List[Union[int, str]]] = None
+
+# Parse either {"texts": [...], "ids": [...]} or an NDJSON body into (ids, texts)
+#
+# NDJSON lines may be plain JSON strings or objects with "text" and an optional "id".
+# Items without an id get their zero-based input position.
+async def _read_batch(request):
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    ids, texts = [], []
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        for line_number, line in enumerate(body.decode("utf-8").splitlines()):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line_number + 1}")
+            if isinstance(item, str):
+                item = {"text": item}
+            if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+                raise HTTPException(status_code=400, detail=f"Line {line_number + 1} has no 'text' field")
+            ids.append(item.get("id", len(texts)))
+            texts.append(item["text"])
+    else:
+        try:
+            batch = BatchRequest.parse_raw(body)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        texts = batch.texts
+        ids = batch.ids if batch.ids is not None else list(range(len(texts)))
+        if len(ids) != len(texts):
+            raise HTTPException(status_code=422, detail="'ids' and 'texts' must have the same length")
+    return ids, texts
+
+@app.post("/predict/batch")
+async def predict_batch_api(request: Request):
+    _require_ready()
+    ids, texts = await _read_batch(request)
+
+    # Cached texts are answered first; the rest are scored in mini-batches
+    version = cache.version
+    cached = [cache.get(text) for text in texts]
+    misses = [index for index, label in enumerate(cached) if label is None]
+
+    # Stream one NDJSON line per text as soon as its mini-batch finishes
+    def stream():
+        hits = [(index, label) for index, label in enumerate(cached) if label is not None]
+        if hits:
+            yield "".join(json.dumps({"id": ids[index], "prediction": label}) + "\n" for index, label in hits)
+        for batch in iter_predictions([texts[index] for index in misses]):
+            batch = [(misses[position], label) for position, label in batch]
+            for index, label in batch:
+                cache.put(texts[index], label, version)
+            yield "".join(json.dumps({"id": ids[index], "prediction": label}) + "\n" for index, label in batch)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/batcher/stats")
+def batcher_stats():
+    return batcher.stats()
+
+# Prometheus scrape endpoint; 404 when metrics are disabled with BERT_METRICS=0
+@app.get("/metrics")
+def metrics_endpoint():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+# Load a new checkpoint from MODEL_DIR without restarting; invalidates the cache
+#
+# Only the process that receives the request reloads. Under bert_workers.py each worker
+# has its own model and cache, so the other workers keep serving the old version until
+# they are reloaded too (or the server is restarted).
+@app.post("/model/reload")
+def reload_model():
+    _require_ready()
+    load_model(reload=True)
+    return {"model_version": cache.version}
+
+# Liveness: the process is up and serving HTTP
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+# Readiness: the model is loaded and warmed up
+@app.get("/ready")
+def ready():
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still loading")
+    return {"ready": True}
+
+# Cold-start timing report (time-to-ready and time-to-first-prediction)
+@app.get("/startup")
+def startup():
+    return startup_report
 
 # Streamlit frontend
 def run_streamlit():
     st.title("Sentiment Analysis using BERT")
-    
+
     # User input for text to analyze
     user_input = st.text_area("Enter text for sentiment analysis:", "I love this product!")
 
     if st.button("Analyze Sentiment"):
         # Call the FastAPI backend for prediction
         response = requests.post("http://127.0.0.1:8000/predict/", json={"text": user_input})
-        
+
         if response.status_code == 200:
             prediction = response.json()["prediction"]
             sentiment = "Positive" if prediction == 1 else "Negative"
@@ -119,17 +325,26 @@ def run_streamlit():
         else:
             st.write("Error in prediction")
 
-if __name__ == "__main__":
-    # Run FastAPI app
+def run_api(host="127.0.0.1", port=8000):
     import uvicorn
+    uvicorn.run(app, host=host, port=port)
+
+if __name__ == "__main__":
+    import argparse
     from threading import Thread
 
-    def run_api():
-        uvicorn.run(app, host="127.0.0.1", port=8000)
+    parser = argparse.ArgumentParser(description="Serve the fine-tuned BERT sentiment model")
+    parser.add_argument("mode", nargs="?", choices=["serve", "ui"], default="ui")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
 
-    # Start the FastAPI app in a separate thread
-    thread = Thread(target=run_api)
-    thread.start()
+    if args.mode == "serve":
+        run_api(args.host, args.port)
+    else:
+        # Start the FastAPI app in a separate thread
+        thread = Thread(target=run_api, args=(args.host, args.port))
+        thread.start()
 
-    # Start the Streamlit frontend
-    run_streamlit()
+        # Start the Streamlit frontend
+        run_streamlit()
@@ -0,0 +1,157 @@
+import os
+import shutil
+import torch
+from transformers import BertConfig, BertTokenizer, BertForSequenceClassification
+
+# Inference backends for the fine-tuned sentiment model
+#
+# Every backend takes the tokenizer's BatchEncoding (PyTorch tensors) and returns the
+# logits as a float tensor of shape (batch, num_labels), so the serving code does not
+# care which runtime produced them.
+#
+#   torch       fp32 BertForSequenceClassification (the original path)
+#   torch-int8  PyTorch dynamic quantization of every nn.Linear to int8
+#   onnx-int8   ONNX Runtime graph with dynamically quantized int8 weights
+#
+# The int8 backends read from an export directory produced by export_torch_int8() /
+# export_onnx_int8() (see bert_quantize.py for the command line).
+
+BACKENDS = ("torch", "torch-int8", "onnx-int8")
+
+TORCH_INT8_WEIGHTS = "model_int8.pt"
+ONNX_FP32_GRAPH = "model.onnx"
+ONNX_INT8_GRAPH = "model_int8.onnx"
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_dir):
+        self.model = BertForSequenceClassification.from_pretrained(model_dir)
+        self.model.eval()
+
+    def logits(self, inputs):
+        with torch.no_grad():  # Use no_grad for inference
+            return self.model(**inputs).logits
+
+class TorchInt8Backend(TorchBackend):
+    name = "torch-int8"
+
+    def __init__(self, export_dir):
+        # Rebuild the fp32 architecture, quantize it, then load the exported int8 weights
+        config = BertConfig.from_pretrained(export_dir)
+        self.model = _quantize_dynamic(BertForSequenceClassification(config))
+        state_dict = torch.load(os.path.join(export_dir, TORCH_INT8_WEIGHTS), map_location="cpu")
+        self.model.load_state_dict(state_dict)
+        self.model.eval()
+
+class OnnxInt8Backend:
+    name = "onnx-int8"
+
+    def __init__(self, export_dir, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The onnx-int8 backend needs onnxruntime: pip install onnxruntime")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(export_dir, ONNX_INT8_GRAPH), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs):
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(["logits"], feed)[0])
+
+# Pick a backend by name; int8 backends default to "<model_dir>_int8"
+def load_backend(name, model_dir, export_dir=None):
+    export_dir = export_dir or default_export_dir(model_dir)
+    if name == "torch":
+        return TorchBackend(model_dir)
+    if name == "torch-int8":
+        return TorchInt8Backend(export_dir)
+    if name == "onnx-int8":
+        return OnnxInt8Backend(export_dir)
+    raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(BACKENDS)}")
+
+def default_export_dir(model_dir):
+    return os.path.normpath(model_dir) + "_int8"
+
+def _quantize_dynamic(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# Copy config and tokenizer files so an export directory is self-contained
+def _copy_model_files(model_dir, export_dir):
+    os.makedirs(export_dir, exist_ok=True)
+    BertTokenizer.from_pretrained(model_dir).save_pretrained(export_dir)
+    shutil.copy(os.path.join(model_dir, "config.json"), os.path.join(export_dir, "config.json"))
+
+# Export step: dynamic int8 quantization of the PyTorch model
+def export_torch_int8(model_dir, export_dir=None):
+    export_dir = export_dir or default_export_dir(model_dir)
+    _copy_model_files(model_dir, export_dir)
+    model = BertForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    quantized = _quantize_dynamic(model)
+    path = os.path.join(export_dir, TORCH_INT8_WEIGHTS)
+    torch.save(quantized.state_dict(), path)
+    return path
+
+# Export step: trace the model to ONNX and quantize the graph weights to int8
+def export_onnx_int8(model_dir, export_dir=None, opset=14):
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        raise ImportError("ONNX export needs onnxruntime: pip install onnx onnxruntime")
+    export_dir = export_dir or default_export_dir(model_dir)
+    _copy_model_files(model_dir, export_dir)
+    tokenizer = BertTokenizer.from_pretrained(model_dir)
+    model = BertForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    fp32_path = os.path.join(export_dir, ONNX_FP32_GRAPH)
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        fp32_path,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset,
+    )
+
+    int8_path = os.path.join(export_dir, ONNX_INT8_GRAPH)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+# Write a small randomly-initialised BERT checkpoint (plus a toy vocabulary)
+#
+# Used for offline benchmarks and self-checks when ./bert_imdb_model is absent. The
+# predictions are meaningless, but shapes, tokenization and timings behave like the
+# real model at a fraction of the size.
+def save_random_checkpoint(model_dir, hidden_size=128, num_layers=2, num_heads=2, vocab_words=2000, seed=0):
+    os.makedirs(model_dir, exist_ok=True)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + [f"w{i}" for i in range(vocab_words)]
+    vocab_path = os.path.join(model_dir, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(vocab) + "\n")
+    BertTokenizer(vocab_path, model_max_length=512).save_pretrained(model_dir)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=512,
+        num_labels=2,
+    )
+    BertForSequenceClassification(config).save_pretrained(model_dir)
+    return model_dir
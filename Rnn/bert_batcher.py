@@ -0,0 +1,149 @@
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from perf_utils import percentile
+
+
+# One pending request waiting in the batching queue
+class _PendingRequest:
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+# Collects requests arriving within a short window and runs them as one batch
+#
+# `run_batch` receives a list of items and must return a list of results in the
+# same order. A batch is flushed as soon as it holds `max_batch_size` items or the
+# oldest item has waited `max_wait_ms`, whichever comes first. The optional `observer`
+# is called with (batch_size, wait_seconds_list) for every batch, e.g. to export metrics.
+class MicroBatcher:
+    def __init__(self, run_batch, max_batch_size=16, max_wait_ms=5, stats_window=10000, observer=None):
+        self.run_batch = run_batch
+        self.observer = observer
+        self.in_flight = 0
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._stats_window = stats_window
+        self._batch_sizes = []
+        self._wait_times_ms = []
+        self._total_batches = 0
+        self._total_requests = 0
+
+    # Start the background thread that drains the queue
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name="bert-micro-batcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)  # Wake up the worker thread
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # Enqueue one item and return a Future that resolves to its own result
+    def submit(self, item):
+        if self._thread is None:
+            self.start()
+        pending = _PendingRequest(item)
+        self._queue.put(pending)
+        return pending.future
+
+    # Convenience wrapper for synchronous callers (e.g. a plain `def` FastAPI endpoint)
+    def predict(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    # Block for the first request, then keep collecting until the batch is full or the window closes
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._stopped.set()
+                break
+            batch.append(pending)
+        return batch
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            self._record(batch, started)
+            self.in_flight += 1
+            try:
+                results = self.run_batch([pending.item for pending in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"run_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                # A failing batch fails every caller in it, but the worker keeps running
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+            finally:
+                self.in_flight -= 1
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+
+    def _record(self, batch, started):
+        if self.observer is not None:
+            self.observer(len(batch), [started - pending.enqueued_at for pending in batch])
+        with self._lock:
+            self._total_batches += 1
+            self._total_requests += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._wait_times_ms.extend((started - pending.enqueued_at) * 1000.0 for pending in batch)
+            # Keep only the most recent samples so stats track the current traffic
+            del self._batch_sizes[:-self._stats_window]
+            del self._wait_times_ms[:-self._stats_window]
+
+    # Batch-size and queue-wait statistics for tuning the batching window
+    def stats(self):
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            waits = sorted(self._wait_times_ms)
+            total_batches = self._total_batches
+            total_requests = self._total_requests
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.qsize(),
+            "in_flight_batches": self.in_flight,
+            "total_batches": total_batches,
+            "total_requests": total_requests,
+            "batch_size": {
+                "mean": sum(sizes) / len(sizes) if sizes else 0.0,
+                "max": max(sizes) if sizes else 0,
+            },
+            "wait_ms": {
+                "p50": percentile(waits, 50),
+                "p95": percentile(waits, 95),
+                "p99": percentile(waits, 99),
+                "max": waits[-1] if waits else 0.0,
+            },
+        }
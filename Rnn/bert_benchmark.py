@@ -0,0 +1,183 @@
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from bert_workers import wait_until_ready
+from perf_utils import add_report_arguments, check_report_arguments, finish_report, host_info, percentile
+
+# Load-test and regression benchmark for the sentiment API
+#
+#   python bert_benchmark.py --report bench.json                    # measure
+#   python bert_benchmark.py --baseline bench_baseline.json         # measure and compare
+#   python bert_benchmark.py --baseline bench_baseline.json --update-baseline
+#
+# Starts the FastAPI app locally (bert.py serve, or bert_workers.py with --workers),
+# replays a seeded mix of short and long IMDB-style reviews at each concurrency level
+# and records p50/p95/p99 latency and throughput. With --baseline it exits non-zero
+# when latency grows or throughput drops by more than --threshold.
+#
+# When the real checkpoint is missing a small randomly-initialised BERT is used, so
+# the benchmark runs fully offline (compare such reports only against each other).
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+REVIEW_WORDS = (
+    "the movie film plot acting actor actress director scene story character ending music "
+    "great terrible boring brilliant awful wonderful slow funny sad beautiful predictable "
+    "was is and but not very really quite too so it this that i loved hated watched again "
+    "never always best worst performance script camera dialogue moment time cast screen"
+).split()
+
+# Seeded mix of short and long review-like texts
+def make_texts(count, long_fraction=0.2, short_words=(10, 60), long_words=(300, 900), seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        low, high = long_words if rng.random() < long_fraction else short_words
+        texts.append(" ".join(rng.choice(REVIEW_WORDS) for _ in range(rng.randint(low, high))))
+    return texts
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Replay `texts` against the API with `concurrency` client threads
+def run_level(url, texts, concurrency):
+    import requests
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    position = iter(range(len(texts)))
+
+    def client():
+        nonlocal errors
+        session = requests.Session()
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                return
+            started = time.perf_counter()
+            try:
+                ok = session.post(url, json={"text": texts[index]}, timeout=120).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with lock:
+                if ok:
+                    latencies.append(elapsed_ms)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(texts),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+        },
+    }
+
+# Start the API in a subprocess and return (process, base_url)
+def start_server(model_dir, workers=None, extra_env=None):
+    port = _free_port()
+    env = dict(os.environ, BERT_MODEL_DIR=model_dir, BERT_CACHE_SIZE="0", **(extra_env or {}))
+    if workers:
+        command = [sys.executable, os.path.join(HERE, "bert_workers.py"), "--workers", str(workers), "--port", str(port)]
+    else:
+        command = [sys.executable, os.path.join(HERE, "bert.py"), "serve", "--port", str(port)]
+    process = subprocess.Popen(command, env=env, cwd=HERE)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url)
+    except Exception:
+        process.kill()
+        raise
+    return process, base_url
+
+def benchmark(model_dir, concurrency_levels, requests_per_level, long_fraction, workers=None, warmup=20):
+    model_dir = os.path.abspath(model_dir)  # The server subprocess runs with cwd=HERE
+    offline = not os.path.isdir(model_dir)
+    with tempfile.TemporaryDirectory() as scratch:
+        if offline:
+            from bert_backends import save_random_checkpoint
+            print(f"{model_dir} not found; using a random tiny BERT (offline mode)")
+            model_dir = save_random_checkpoint(os.path.join(scratch, "tiny_bert"))
+
+        process, base_url = start_server(model_dir, workers)
+        try:
+            url = f"{base_url}/predict/"
+            run_level(url, make_texts(warmup, long_fraction, seed=1), 1)
+            levels = []
+            for concurrency in concurrency_levels:
+                result = run_level(url, make_texts(requests_per_level, long_fraction), concurrency)
+                levels.append(result)
+                print(f"concurrency {concurrency:>3}: {result['throughput_rps']:8.1f} req/s  "
+                      f"p50 {result['latency_ms']['p50']:8.1f}ms  p95 {result['latency_ms']['p95']:8.1f}ms  "
+                      f"p99 {result['latency_ms']['p99']:8.1f}ms  errors {result['errors']}")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+    return {
+        "model": "random-tiny-bert" if offline else model_dir,
+        "workers": workers or 1,
+        "requests_per_level": requests_per_level,
+        "long_fraction": long_fraction,
+        "host": host_info(),
+        "levels": levels,
+    }
+
+# Compare a report against a baseline; returns a list of human-readable regressions
+def compare(report, baseline, threshold):
+    failures = []
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in report["levels"]:
+        reference = baseline_levels.get(level["concurrency"])
+        if reference is None:
+            continue
+        concurrency = level["concurrency"]
+        if level["errors"] > reference["errors"]:
+            failures.append(f"concurrency {concurrency}: {level['errors']} errors (baseline {reference['errors']})")
+        if reference["throughput_rps"] and level["throughput_rps"] < reference["throughput_rps"] * (1 - threshold):
+            failures.append(f"concurrency {concurrency}: throughput {level['throughput_rps']} req/s "
+                            f"< baseline {reference['throughput_rps']} req/s")
+        for pct in ("p50", "p95", "p99"):
+            current, previous = level["latency_ms"][pct], reference["latency_ms"][pct]
+            if previous and current > previous * (1 + threshold):
+                failures.append(f"concurrency {concurrency}: {pct} {current}ms > baseline {previous}ms")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test and regression benchmark for the BERT sentiment API")
+    parser.add_argument("--model-dir", default=os.environ.get("BERT_MODEL_DIR", "./bert_imdb_model"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--long-fraction", type=float, default=0.2, help="Share of long (300-900 word) reviews")
+    parser.add_argument("--workers", type=int, default=None, help="Serve with bert_workers.py and N workers")
+    add_report_arguments(parser, "bench_report.json", 0.10)
+    args = parser.parse_args()
+    check_report_arguments(parser, args)
+
+    report = benchmark(args.model_dir, args.concurrency, args.requests, args.long_fraction, args.workers)
+    finish_report(report, args, compare, same_setup=("model",))
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# LRU + TTL cache for model predictions
+#
+# Keys are a SHA-256 of the model version and the normalized text, so retries and
+# resubmitted text (e.g. the Streamlit frontend re-posting the same text area) skip
+# inference. Changing the model version clears the cache.
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Normalize text the way the tokenizer would see it, so trivial variants share a key
+def normalize_text(text, lowercase=True):
+    text = unicodedata.normalize("NFC", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.lower() if lowercase else text
+
+# Fingerprint of a checkpoint directory: file names, sizes and modification times
+def model_version(model_dir, *extra):
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(model_dir)):
+        path = os.path.join(model_dir, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    for value in extra:
+        digest.update(f"{value};".encode())
+    return digest.hexdigest()[:16]
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl_seconds=3600, lowercase=True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lowercase = lowercase
+        self.version = None
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, text, version=None):
+        normalized = normalize_text(text, self.lowercase)
+        version = self.version if version is None else version
+        return hashlib.sha256(f"{version}\0{normalized}".encode("utf-8")).hexdigest()
+
+    # Switch to a new model version; cached predictions of the old model are dropped
+    def set_version(self, version):
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+    def get(self, text):
+        if not self.enabled:
+            return None
+        key = self.key(text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Store a prediction; pass the version read before inference so a result computed
+    # by a model that was swapped out meanwhile is not cached under the new version
+    def put(self, text, value, version=None):
+        if not self.enabled:
+            return
+        key = self.key(text, version)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "model_version": self.version,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -1,8 +1,11 @@
 import streamlit as st
 from transformers import BertTokenizer, BertModel
-import torch
-from sklearn.metrics.pairwise import cosine_similarity
 import base64
+import os
+from chatbot_index import FaqIndex, IVFIndex, load_qa_pairs
+from embedding_store import EmbeddingStore
+from chatbot_encoder import encode_batch
+from bert_batcher import MicroBatcher
 
 #adding img
 def set_background(image_path):
@@ -22,16 +25,18 @@ def set_background(image_path):
 
 # Call the function to set the background
 set_background('/Users/palammysurareddy/Downloads/16th,17th- RNN/6 project- rnn, azur ai/Azure-Blob-Storage-OCR-and-Face-Detection-main/img.jpg')
+MODEL_NAME = 'bert-base-uncased'
+
 # Load BERT tokenizer and model
 @st.cache_resource
 def load_bert_model():
-    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-    model = BertModel.from_pretrained('bert-base-uncased')
+    tokenizer = BertTokenizer.from_pretrained(MODEL_NAME)
+    model = BertModel.from_pretrained(MODEL_NAME)
     return tokenizer, model
 
 tokenizer, model = load_bert_model()
 
-# Predefined questions and responses
+# Predefined questions and responses (used when CHATBOT_QA_PATH is not set)
 qa_pairs = {
     "What is your name?": "I am a chatbot powered by BERT!",
     "How are you?": "I'm just a bunch of code, but I'm doing great!",
@@ -43,32 +48,54 @@ qa_pairs = {
     "what is microsoft azure":"Microsoft Azure is a cloud computing platform and service provided by Microsoft. It offers tools and resources for building, deploying, and managing applications and services through Microsoft's global data centers. Azure supports a wide range of services like virtual machines, databases, AI, analytics, and storage, making it a flexible solution for businesses and developers.",
 }
 
-# Function to get BERT embeddings
-def get_bert_embedding(text):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    return outputs.last_hidden_state.mean(dim=1).numpy()
+# Embed a list of texts into an (n, dim) array in length-sorted padded batches
+def get_bert_embeddings(texts):
+    return encode_batch(texts, tokenizer, model, batch_size=32, max_length=128)
+
+# Queries from concurrent sessions arriving within a few ms share one forward pass
+@st.cache_resource
+def load_query_batcher():
+    return MicroBatcher(lambda texts: list(get_bert_embeddings(texts)), max_batch_size=16, max_wait_ms=5).start()
+
+query_batcher = load_query_batcher()
+
+# QA pairs come from a CSV/JSONL file if one is configured
+QA_PATH = os.environ.get("CHATBOT_QA_PATH")
 
-# Precompute embeddings for predefined questions
-predefined_embeddings = {question: get_bert_embedding(question) for question in qa_pairs}
+# Question embeddings persist here between runs (memory-mapped .npy + JSON index)
+EMBEDDING_DIR = os.environ.get("CHATBOT_EMBEDDING_DIR", "./embedding_store")
+
+# Corpora at least this large use the approximate IVF index instead of exact search
+ANN_MIN_SIZE = int(os.environ.get("CHATBOT_ANN_MIN_SIZE", "100000"))
+ANN_N_PROBE = int(os.environ.get("CHATBOT_ANN_N_PROBE", "8"))
+
+# Build the FAQ index once per QA file version
+#
+# Streamlit reruns hit st.cache_resource; a fresh process maps the stored embeddings and
+# only runs BERT on questions that are new or changed since the last start.
+@st.cache_resource
+def load_faq_index(qa_path, qa_mtime):
+    pairs = load_qa_pairs(qa_path) if qa_path else list(qa_pairs.items())
+    questions = [question for question, _ in pairs]
+    store = EmbeddingStore(EMBEDDING_DIR, f"{MODEL_NAME}-mean-128")  # Pooling and max_length are part of the key
+    # The QA file is the whole corpus, so rows of removed or edited questions are dropped
+    embeddings = store.get_or_embed(questions, get_bert_embeddings, compact=True)
+    answers = [answer for _, answer in pairs]
+    if len(questions) >= ANN_MIN_SIZE:
+        return IVFIndex(questions, answers, embeddings, n_probe=ANN_N_PROBE, normalized=True)
+    return FaqIndex(questions, answers, embeddings, normalized=True)
+
+faq_index = load_faq_index(QA_PATH, os.path.getmtime(QA_PATH) if QA_PATH else None)
 
 # Function to get the chatbot's response
 def chatbot_response(user_input):
-    user_embedding = get_bert_embedding(user_input)
-    
-    # Compute cosine similarities
-    similarities = {
-        question: cosine_similarity(user_embedding, predefined_embeddings[question])[0][0]
-        for question in qa_pairs
-    }
-    
-    # Find the most similar question
-    best_match = max(similarities, key=similarities.get)
-    
-    # Return the response if similarity is high enough
-    if similarities[best_match] > 0.5:  # Threshold can be adjusted
-        return qa_pairs[best_match]
+    user_embedding = query_batcher.predict(user_input)
+
+    # Cosine similarity against every question in one matrix-vector product;
+    # return the best match's response if similarity is high enough
+    response = faq_index.answer(user_embedding, threshold=0.5)  # Threshold can be adjusted
+    if response is not None:
+        return response
     else:
         return "I'm not sure how to respond to that."
 
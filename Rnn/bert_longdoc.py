@@ -0,0 +1,114 @@
+import torch
+
+# Sliding-window inference for reviews longer than BERT's 512-token limit
+#
+# Each document is split into overlapping windows of at most `max_length` tokens
+# (including [CLS]/[SEP]). Windows from *all* documents in a call are sorted by length
+# and run together in shared padded forward passes, then the window logits are pooled
+# back into one logit vector per document.
+
+MAX_LENGTH = 512
+OVERLAP = 128
+POOLING_RULES = ("mean", "max", "length_weighted")
+
+# Split one text into overlapping windows of token ids with special tokens added
+def split_windows(tokenizer, text, max_length=MAX_LENGTH, overlap=OVERLAP):
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    content = max_length - 2  # Room for [CLS] and [SEP]
+    if overlap >= content:
+        raise ValueError(f"overlap ({overlap}) must be smaller than the window content size ({content})")
+    step = content - overlap
+    starts = list(range(0, max(len(ids) - overlap, 1), step))
+    return [[tokenizer.cls_token_id] + ids[start:start + content] + [tokenizer.sep_token_id] for start in starts]
+
+# Pad a list of token-id windows into model inputs
+def collate_windows(tokenizer, windows):
+    longest = max(len(window) for window in windows)
+    input_ids = torch.full((len(windows), longest), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(windows), longest), dtype=torch.long)
+    for row, window in enumerate(windows):
+        input_ids[row, :len(window)] = torch.tensor(window, dtype=torch.long)
+        attention_mask[row, :len(window)] = 1
+    return {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": torch.zeros_like(input_ids)}
+
+# Combine the window logits of one document
+def pool_logits(window_logits, window_lengths, rule="mean"):
+    if rule == "mean":
+        return window_logits.mean(dim=0)
+    if rule == "max":
+        return window_logits.max(dim=0).values
+    if rule == "length_weighted":
+        weights = torch.tensor(window_lengths, dtype=window_logits.dtype).unsqueeze(1)
+        return (window_logits * weights).sum(dim=0) / weights.sum()
+    raise ValueError(f"Unknown pooling rule '{rule}', expected one of {', '.join(POOLING_RULES)}")
+
+# Return one pooled logit vector per text, with all windows sharing batched forward passes
+#
+# `logits_fn` takes padded model inputs and returns logits (e.g. a backend's `logits`).
+def long_document_logits(texts, tokenizer, logits_fn, batch_size=16, pooling="mean",
+                         max_length=MAX_LENGTH, overlap=OVERLAP):
+    windows, owners = [], []
+    for doc, text in enumerate(texts):
+        for window in split_windows(tokenizer, text, max_length, overlap):
+            windows.append(window)
+            owners.append(doc)
+
+    # Sort by length so each forward pass pads as little as possible; the sort is
+    # stable, which keeps the batching (and so the results) deterministic
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+    window_logits = [None] * len(windows)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        logits = logits_fn(collate_windows(tokenizer, [windows[i] for i in indices]))
+        for row, index in enumerate(indices):
+            window_logits[index] = logits[row]
+
+    rows_by_doc = [[] for _ in texts]
+    for index, owner in enumerate(owners):
+        rows_by_doc[owner].append(index)
+    pooled = []
+    for rows in rows_by_doc:
+        pooled.append(pool_logits(torch.stack([window_logits[i] for i in rows]),
+                                  [len(windows[i]) for i in rows], pooling))
+    return torch.stack(pooled)
+
+# Throughput on synthetic 5k-token documents: shared batched windows vs. one forward
+# pass per window (correctness is covered by test_bert_longdoc.py)
+#
+#   python bert_longdoc.py [--docs 8] [--tokens 5000]
+#
+# Uses a small randomly-initialised BERT so it runs offline.
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    import time
+    from transformers import BertTokenizer
+    from bert_backends import TorchBackend, save_random_checkpoint
+
+    parser = argparse.ArgumentParser(description="Sliding-window long-document throughput")
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--pooling", choices=POOLING_RULES, default="mean")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        save_random_checkpoint(model_dir)
+        tokenizer = BertTokenizer.from_pretrained(model_dir)
+        backend = TorchBackend(model_dir)
+
+    rng = random.Random(0)
+    texts = [" ".join(f"w{rng.randrange(2000)}" for _ in range(args.tokens)) for _ in range(args.docs)]
+
+    windows = sum(len(split_windows(tokenizer, text)) for text in texts)
+    started = time.perf_counter()
+    long_document_logits(texts, tokenizer, backend.logits, args.batch_size, args.pooling)
+    batched = time.perf_counter() - started
+    started = time.perf_counter()
+    for text in texts:
+        long_document_logits([text], tokenizer, backend.logits, batch_size=1, pooling=args.pooling)
+    serial = time.perf_counter() - started
+    print(f"{args.docs} docs x {args.tokens} tokens = {windows} windows")
+    print(f"batched: {batched:.2f}s ({args.docs / batched:.1f} docs/s)")
+    print(f"serial:  {serial:.2f}s ({args.docs / serial:.1f} docs/s), speedup {serial / batched:.2f}x")
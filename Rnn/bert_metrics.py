@@ -0,0 +1,157 @@
+import bisect
+import os
+import threading
+import time
+
+# Minimal Prometheus-style metrics for the sentiment API
+#
+# Stage timings are recorded with `span("tokenize")` etc. and exported as histograms in
+# the Prometheus text exposition format by `render()`. Setting BERT_METRICS=0 turns the
+# whole thing off: `span()` then returns a shared no-op context and nothing is recorded.
+
+ENABLED = os.environ.get("BERT_METRICS", "1") != "0"
+
+# Seconds; covers sub-millisecond tokenization up to multi-second long-document passes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, label_name=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_name = label_name
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, label=None):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {label: list(values) for label, values in self._series.items()}
+        for label, values in sorted(series.items(), key=lambda item: str(item[0])):
+            base = [(self.label_name, label)] if self.label_name else []
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", base + [("le", le)], cumulative
+            yield f"{self.name}_sum", base, values[-2]
+            yield f"{self.name}_count", base, values[-1]
+
+class Counter:
+    type = "counter"
+
+    # `fn` reads a total kept elsewhere (e.g. the cache's hit count) at scrape time
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, [], self.fn() if self.fn is not None else self.value
+
+class Gauge:
+    type = "gauge"
+
+    # `fn` makes the gauge read its value at scrape time instead of being set
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def samples(self):
+        yield self.name, [], self.fn() if self.fn is not None else self.value
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "bert_stage_duration_seconds", "Time spent in each stage of the inference path.", label_name="stage"))
+
+# Times a block and records it under `stage` in the stage histogram
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_seconds.observe(time.perf_counter() - self.started, self.stage)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(stage):
+    return _Span(stage) if ENABLED else _NOOP_SPAN
+
+# Record an already measured duration (e.g. queue wait computed by the batcher)
+def observe(stage, seconds):
+    if ENABLED:
+        stage_seconds.observe(seconds, stage)
+
+def render():
+    return registry.render()
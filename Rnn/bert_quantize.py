@@ -0,0 +1,112 @@
+import argparse
+import json
+import time
+import torch
+from transformers import BertTokenizer
+from bert_backends import BACKENDS, export_onnx_int8, export_torch_int8, load_backend
+from perf_utils import percentile
+
+# Export and compare quantized CPU backends for the sentiment model
+#
+#   python bert_quantize.py export --format torch-int8
+#   python bert_quantize.py export --format onnx-int8
+#   python bert_quantize.py compare --backends torch torch-int8 onnx-int8 --samples 2000
+#
+# `compare` scores the same IMDB test-split sample with every backend and reports
+# accuracy, agreement with fp32, per-batch latency and throughput. It exits non-zero
+# when an int8 backend loses more accuracy than --max-accuracy-drop.
+
+# Deterministic sample of the IMDB test split
+def load_imdb_sample(samples, seed=0):
+    from datasets import load_dataset
+    test = load_dataset("imdb", split="test").shuffle(seed=seed)
+    if samples:
+        test = test.select(range(min(samples, len(test))))
+    return test["text"], test["label"]
+
+# Run one backend over the sample and collect predictions plus timings
+def evaluate_backend(backend, tokenizer, texts, labels, batch_size):
+    predictions = []
+    batch_ms = []
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(texts[start:start + batch_size], padding=True, truncation=True, return_tensors="pt")
+        batch_started = time.perf_counter()
+        logits = backend.logits(inputs)
+        batch_ms.append((time.perf_counter() - batch_started) * 1000.0)
+        predictions.extend(logits.argmax(dim=-1).tolist())
+    elapsed = time.perf_counter() - started
+
+    batch_ms.sort()
+    correct = sum(int(p == y) for p, y in zip(predictions, labels))
+    return predictions, {
+        "accuracy": correct / len(labels) if labels else 0.0,
+        "batch_latency_ms": {"p50": percentile(batch_ms, 50), "p95": percentile(batch_ms, 95)},
+        "throughput_texts_per_s": len(texts) / elapsed if elapsed else 0.0,
+        "elapsed_s": elapsed,
+    }
+
+def compare(model_dir, backends, samples, batch_size, export_dir=None, num_threads=None):
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    tokenizer = BertTokenizer.from_pretrained(model_dir)
+    texts, labels = load_imdb_sample(samples)
+
+    report = {"model_dir": model_dir, "samples": len(texts), "batch_size": batch_size,
+              "num_threads": torch.get_num_threads(), "backends": {}}
+    reference = None
+    # Run fp32 first so every int8 backend can be compared against it
+    for name in sorted(backends, key=lambda name: name != "torch"):
+        backend = load_backend(name, model_dir, export_dir)
+        predictions, result = evaluate_backend(backend, tokenizer, texts, labels, batch_size)
+        if name == "torch":
+            reference = predictions
+        if reference is not None:
+            result["agreement_with_fp32"] = sum(int(a == b) for a, b in zip(predictions, reference)) / len(reference)
+        report["backends"][name] = result
+        print(f"{name:>10}: accuracy={result['accuracy']:.4f} "
+              f"p50={result['batch_latency_ms']['p50']:.1f}ms "
+              f"throughput={result['throughput_texts_per_s']:.1f} texts/s")
+
+    if "torch" in report["backends"]:
+        fp32 = report["backends"]["torch"]
+        for name, result in report["backends"].items():
+            result["accuracy_drop"] = fp32["accuracy"] - result["accuracy"]
+            result["speedup_vs_fp32"] = result["throughput_texts_per_s"] / fp32["throughput_texts_per_s"]
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized CPU backends for the BERT sentiment model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write an int8 model next to the fp32 checkpoint")
+    export_parser.add_argument("--model-dir", default="./bert_imdb_model")
+    export_parser.add_argument("--export-dir", default=None)
+    export_parser.add_argument("--format", choices=["torch-int8", "onnx-int8"], default="torch-int8")
+
+    compare_parser = subparsers.add_parser("compare", help="Accuracy parity and latency/throughput report")
+    compare_parser.add_argument("--model-dir", default="./bert_imdb_model")
+    compare_parser.add_argument("--export-dir", default=None)
+    compare_parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["torch", "torch-int8"])
+    compare_parser.add_argument("--samples", type=int, default=2000, help="IMDB test reviews to score (0 = all 25k)")
+    compare_parser.add_argument("--batch-size", type=int, default=32)
+    compare_parser.add_argument("--threads", type=int, default=None)
+    compare_parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    compare_parser.add_argument("--report", default="quantization_report.json")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        exporter = export_torch_int8 if args.format == "torch-int8" else export_onnx_int8
+        path = exporter(args.model_dir, args.export_dir)
+        print(f"Exported {args.format} model to {path} (serve it with BERT_BACKEND={args.format})")
+    else:
+        report = compare(args.model_dir, args.backends, args.samples, args.batch_size, args.export_dir, args.threads)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+        failed = [name for name, result in report["backends"].items()
+                  if result.get("accuracy_drop", 0.0) > args.max_accuracy_drop]
+        if failed:
+            print(f"Accuracy parity check failed for: {', '.join(failed)}")
+            raise SystemExit(1)
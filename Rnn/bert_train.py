@@ -0,0 +1,159 @@
+import argparse
+import os
+import time
+import torch
+from transformers import BertTokenizer, BertForSequenceClassification, DataCollatorWithPadding, Trainer, TrainingArguments
+from datasets import load_dataset, load_from_disk
+
+# Training entry point for the IMDB sentiment model served by bert.py
+#
+#   python bert_train.py --output-dir ./bert_imdb_model
+#
+# Nothing here runs on import, so the API can import helpers without retraining.
+
+MAX_LENGTH = 512
+MODEL_COLUMNS = ("input_ids", "token_type_ids", "attention_mask", "label", "labels")
+
+# Tokenize the dataset
+#
+# With dynamic padding the examples are only truncated here; the data collator pads
+# each batch to its own longest example. The "length" column feeds the
+# length-grouped sampler so similar-length reviews land in the same batch.
+def tokenize_function(tokenizer, examples, dynamic_padding=True):
+    padding = False if dynamic_padding else "max_length"
+    encoded = tokenizer(examples['text'], padding=padding, truncation=True, max_length=MAX_LENGTH)
+    encoded["length"] = [len(ids) for ids in encoded["input_ids"]]
+    return encoded
+
+# Tokenize once and cache the result on disk, keyed by tokenizer and padding mode
+def load_tokenized_dataset(tokenizer, dataset, cache_dir, dynamic_padding=True):
+    name = os.path.basename(os.path.normpath(tokenizer.name_or_path))
+    mode = "dynamic" if dynamic_padding else "max_length"
+    path = os.path.join(cache_dir, f"imdb-{name}-{MAX_LENGTH}-{mode}")
+    if os.path.isdir(path):
+        print(f"Loading tokenized dataset from {path}")
+        return load_from_disk(path)
+    tokenized = dataset.map(lambda examples: tokenize_function(tokenizer, examples, dynamic_padding), batched=True)
+    tokenized.save_to_disk(path)
+    return tokenized
+
+# DataCollatorWithPadding that only passes the model's inputs and labels on
+#
+# The Trainer runs with remove_unused_columns=False so the "length" column survives
+# until the length-grouped sampler reads it; "text" and "length" are dropped here.
+class ModelInputCollator(DataCollatorWithPadding):
+    def __call__(self, features):
+        return super().__call__([{k: v for k, v in f.items() if k in MODEL_COLUMNS} for f in features])
+
+# Trainer that logs tokens/second next to the loss
+#
+# Only real (attention-masked) tokens are counted, so the metric shows the useful work
+# per second; "padding_ratio" shows how much of each batch was padding.
+class TokenThroughputTrainer(Trainer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tokens = 0
+        self._padded_tokens = 0
+        self._window_started = None
+
+    def training_step(self, model, inputs, *args, **kwargs):
+        if self._window_started is None:
+            self._window_started = time.perf_counter()
+        mask = inputs.get("attention_mask")
+        if mask is not None:
+            self._tokens += int(mask.sum().item())
+            self._padded_tokens += mask.numel()
+        return super().training_step(model, inputs, *args, **kwargs)
+
+    def log(self, logs, *args, **kwargs):
+        if "loss" in logs and self._window_started is not None:
+            elapsed = time.perf_counter() - self._window_started
+            if elapsed > 0:
+                logs["tokens_per_second"] = round(self._tokens / elapsed, 1)
+            if self._padded_tokens:
+                logs["padding_ratio"] = round(1 - self._tokens / self._padded_tokens, 4)
+            self._tokens = 0
+            self._padded_tokens = 0
+            self._window_started = time.perf_counter()
+        super().log(logs, *args, **kwargs)
+
+def train(output_dir='./bert_imdb_model', num_train_epochs=3, dynamic_padding=True, cache_dir='./tokenized_cache'):
+    # Load the pre-trained BERT model and tokenizer
+    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+    model = BertForSequenceClassification.from_pretrained('bert-base-uncased', num_labels=2)
+
+    # Load the IMDB dataset
+    dataset = load_dataset("imdb")
+
+    # Apply the tokenization function to the dataset (cached after the first run)
+    tokenized_datasets = load_tokenized_dataset(tokenizer, dataset, cache_dir, dynamic_padding)
+
+    # Define training arguments
+    training_args = TrainingArguments(
+        output_dir='./results',          # Output directory
+        eval_strategy="epoch",           # Evaluate every epoch
+        learning_rate=2e-5,              # Learning rate for optimization
+        per_device_train_batch_size=8,   # Batch size for training
+        per_device_eval_batch_size=8,    # Batch size for evaluation
+        num_train_epochs=num_train_epochs,  # Number of epochs to train
+        weight_decay=0.01,               # Strength of weight decay (regularization)
+        logging_dir='./logs',            # Directory for storing logs
+        logging_steps=10,
+        # Batch similar-length reviews together, using the precomputed "length" column
+        train_sampling_strategy="group_by_length" if dynamic_padding else "random",
+        remove_unused_columns=not dynamic_padding,
+    )
+
+    # Initialize the Trainer
+    trainer = TokenThroughputTrainer(
+        model=model,                         # The model to train
+        args=training_args,                  # Training arguments
+        train_dataset=tokenized_datasets['train'],  # Training dataset
+        eval_dataset=tokenized_datasets['test'],   # Evaluation dataset
+        data_collator=ModelInputCollator(tokenizer, pad_to_multiple_of=8) if dynamic_padding else None,
+    )
+
+    # Start the training process
+    trainer.train()
+
+    # After fine-tuning, use the model for predictions
+    inputs = tokenizer(["I love this product!", "This is terrible, do not buy it."], padding=True, truncation=True, return_tensors="pt")
+
+    # Ensure model is in evaluation mode
+    model.eval()
+
+    # Move inputs and model to the same device (e.g., CUDA if available)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model.to(device)  # Move the model to the device
+    inputs = inputs.to(device)  # Move the inputs to the device
+
+    # Get predictions
+    with torch.no_grad():  # Use torch.no_grad() for inference
+        outputs = model(**inputs)
+        logits = outputs.logits
+
+    # Convert logits to probabilities
+    probs = torch.nn.functional.softmax(logits, dim=-1)  # Use softmax to get probabilities
+
+    # Get predicted class (0 or 1 for binary classification)
+    predictions = torch.argmax(probs, dim=-1)  # Use argmax to get the predicted class
+    print(predictions)
+
+    # Evaluate the model on the test set
+    eval_results = trainer.evaluate()
+    print(eval_results)
+
+    # Save the trained model
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return eval_results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tune BERT on IMDB for the sentiment API")
+    parser.add_argument("--output-dir", default="./bert_imdb_model")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--cache-dir", default="./tokenized_cache", help="Where the tokenized IMDB dataset is cached")
+    parser.add_argument("--no-dynamic-padding", action="store_true", help="Pad every review to 512 tokens (old behaviour)")
+    args = parser.parse_args()
+    train(output_dir=args.output_dir, num_train_epochs=args.epochs,
+          dynamic_padding=not args.no_dynamic_padding, cache_dir=args.cache_dir)
@@ -0,0 +1,174 @@
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Pre-fork multi-process server for the sentiment API
+#
+#   python bert_workers.py --workers 4                 # serve on 127.0.0.1:8000
+#   python bert_workers.py --benchmark --workers 4     # req/s for 1..4 workers
+#
+# The parent process loads the model once, then forks N uvicorn workers that all accept
+# on the same listening socket. The weights are never written after loading, so the
+# children share the parent's pages copy-on-write instead of each holding a copy.
+# Each worker pins its own intra-op thread count so N workers don't oversubscribe cores.
+
+# Create the shared listening socket before forking
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(sock, threads_per_worker, log_level):
+    import torch
+    import uvicorn
+    import bert
+
+    torch.set_num_threads(threads_per_worker)
+    config = uvicorn.Config(bert.app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _fork_worker(sock, threads_per_worker, log_level):
+    pid = os.fork()
+    if pid == 0:
+        # Child: default signal handling so uvicorn can install its own
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            _run_worker(sock, threads_per_worker, log_level)
+        finally:
+            os._exit(0)
+    return pid
+
+def serve(workers, host="127.0.0.1", port=8000, threads_per_worker=None, log_level="warning"):
+    import torch
+    import bert
+
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+    # Keep the parent single-threaded: an OpenMP pool started before fork() is not
+    # inherited by the children and can deadlock them
+    torch.set_num_threads(1)
+    bert.load_model()
+
+    # Move everything allocated so far out of the GC's reach, so collections in the
+    # workers don't touch (and copy) the parent's pages
+    gc.freeze()
+
+    sock = bind_socket(host, port)
+    children = {_fork_worker(sock, threads_per_worker, log_level) for _ in range(workers)}
+    print(f"Serving on http://{host}:{port} with {workers} workers x {threads_per_worker} threads")
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # Reap workers and replace any that die unexpectedly
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting")
+            children.add(_fork_worker(sock, threads_per_worker, log_level))
+    sock.close()
+
+# Fire `requests_total` POSTs at `concurrency` and return requests/second
+def measure_throughput(url, texts, requests_total, concurrency):
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def send(i):
+        response = session.post(url, json={"text": texts[i % len(texts)]})
+        response.raise_for_status()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(requests_total)))
+    return requests_total / (time.perf_counter() - started)
+
+def wait_until_ready(base_url, timeout=600):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{base_url} did not become ready within {timeout}s")
+
+# Benchmark: start the server with 1..max_workers workers and record req/s for each
+def benchmark(max_workers, host, port, requests_total, concurrency, threads_per_worker=None):
+    # Cache hits would hide the model cost, so every request text is distinct
+    texts = [f"Review number {i}: the plot was {'great' if i % 2 else 'terrible'} and the acting was fine."
+             for i in range(requests_total)]
+    env = dict(os.environ, BERT_CACHE_SIZE="0")
+    base_url = f"http://{host}:{port}"
+    results = []
+    for workers in range(1, max_workers + 1):
+        command = [sys.executable, os.path.abspath(__file__), "--workers", str(workers),
+                   "--host", host, "--port", str(port)]
+        if threads_per_worker:
+            command += ["--threads-per-worker", str(threads_per_worker)]
+        server = subprocess.Popen(command, env=env)
+        try:
+            wait_until_ready(base_url)
+            measure_throughput(f"{base_url}/predict/", texts, min(50, requests_total), concurrency)  # Warm-up
+            rps = measure_throughput(f"{base_url}/predict/", texts, requests_total, concurrency)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        results.append({"workers": workers, "requests_per_s": round(rps, 2)})
+        print(f"{workers} worker(s): {rps:.1f} req/s (x{rps / results[0]['requests_per_s']:.2f})")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process BERT sentiment API")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per worker (default: cores // workers)")
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--benchmark", action="store_true", help="Measure req/s scaling from 1 to --workers")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--report", default=None, help="Write the benchmark results to this JSON file")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        results = benchmark(args.workers, args.host, args.port, args.requests, args.concurrency, args.threads_per_worker)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump({"cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+    else:
+        serve(args.workers, args.host, args.port, args.threads_per_worker, args.log_level)
@@ -1,9 +1,7 @@
 # 1. Set Up Azure Blob Client
 
-from azure.storage.blob import BlobServiceClient
-
-def get_blob_service_client(connection_string):
-    return BlobServiceClient.from_connection_string(connection_string)
+# Azure, or a local directory for offline runs and benchmarks (see storage_backend.py)
+from storage_backend import get_blob_service_client
 
 #2. Create Blob Container
 
@@ -17,40 +15,154 @@ def create_blob_container(blob_service_client, container_name):
 
 #3. Upload Images
 
-def upload_images_to_blob(blob_service_client, container_name, file_list):
+from blob_upload import format_summary, iter_upload_files, upload_files
+
+# Parallel upload with a bounded worker pool; large files go up in blocks (see blob_upload.py)
+def upload_images_to_blob(blob_service_client, container_name, file_list, **upload_options):
     try:
         container_client = blob_service_client.get_container_client(container_name)
-        for file in file_list:
-            blob_client = container_client.get_blob_client(file.name)
-            blob_client.upload_blob(file, overwrite=True)
-        return f"Uploaded {len(file_list)} images successfully."
+        return format_summary(upload_files(container_client, file_list, **upload_options))
     except Exception as e:
         return f"Error: {e}"
 
 
 #Step 4: Extract Information from Images
 
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import os
 import easyocr
+import streamlit as st
+from ocr_cache import OcrResultStore, is_unchanged
+
+# Local store of OCR results, so unchanged blobs are not downloaded and OCR'd again
+OCR_CACHE_PATH = os.environ.get("OCR_CACHE_PATH", "ocr_results.db")
 
-def extract_text_from_images(blob_service_client, container_name):
-    reader = easyocr.Reader(['en'])
+# Long-lived EasyOCR reader, shared by every OCR worker
+# (loading the detection and recognition models takes seconds, so do it once)
+@st.cache_resource
+def get_ocr_reader():
+    return easyocr.Reader(['en'])
+
+_DONE = object()
+
+# Stream (blob_name, extracted_text, error) tuples as each blob finishes
+#
+# Producer/consumer pipeline: a bounded pool of download threads fetches blobs into a
+# bounded queue, and `ocr_workers` threads run OCR on them with the shared reader. When
+# OCR falls behind, the full queue blocks the downloaders (backpressure), so at most
+# `queue_size` downloaded images wait in memory. A failing blob yields its error and
+# does not stop the others.
+#
+# With a `store` (OcrResultStore), blobs whose ETag/last-modified time match the stored
+# result are yielded from the store without being downloaded; `force_refresh` ignores
+# stored results. Pass a dict as `summary` to get processed/skipped/failed counts.
+def iter_extract_text_from_images(blob_service_client, container_name, download_workers=8, ocr_workers=2,
+                                  queue_size=16, reader=None, store=None, force_refresh=False, summary=None):
+    summary = summary if summary is not None else {}
+    summary.update(processed=0, skipped=0, failed=0, removed=0)
+    stored = store.load(container_name) if store is not None and not force_refresh else {}
+    reader = reader or get_ocr_reader()
     container_client = blob_service_client.get_container_client(container_name)
-    extracted_data = {}
+    downloaded = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    # Put into the bounded queue, giving up if the consumer went away
+    def put_downloaded(item):
+        while not stop.is_set():
+            try:
+                downloaded.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
 
-    for blob in container_client.list_blobs():
-        blob_client = container_client.get_blob_client(blob.name)
-        image_data = blob_client.download_blob().readall()
+    def download(blob):
+        if stop.is_set():
+            return
+        try:
+            image_data = container_client.get_blob_client(blob.name).download_blob().readall()
+        except Exception as e:
+            results.put(("failed", blob.name, None, e))
+            return
+        put_downloaded((blob, image_data))
 
-        # Perform OCR
-        results = reader.readtext(image_data)
-        extracted_text = " ".join([res[1] for res in results])
-        extracted_data[blob.name] = extracted_text
+    def produce():
+        try:
+            present = []
+            with ThreadPoolExecutor(max_workers=download_workers) as pool:
+                for blob in container_client.list_blobs():
+                    if stop.is_set():
+                        break
+                    present.append(blob.name)
+                    cached = stored.get(blob.name)
+                    if is_unchanged(cached, getattr(blob, "etag", None), getattr(blob, "last_modified", None)):
+                        results.put(("skipped", blob.name, cached[2], None))
+                    else:
+                        pool.submit(download, blob)
+            if store is not None and not stop.is_set():
+                summary["removed"] = store.prune(container_name, present)
+        except Exception as e:
+            results.put(("failed", None, None, e))  # Listing the container failed
+        finally:
+            for _ in range(ocr_workers):
+                put_downloaded(_DONE)
 
+    # Polls so it also exits when the consumer stops early and no sentinel arrives
+    def recognize():
+        try:
+            while not stop.is_set():
+                try:
+                    item = downloaded.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    return
+                blob, image_data = item
+                try:
+                    # Perform OCR
+                    extracted_text = " ".join([res[1] for res in reader.readtext(image_data)])
+                    if store is not None:
+                        store.save(container_name, blob.name, getattr(blob, "etag", None),
+                                   getattr(blob, "last_modified", None), extracted_text)
+                    results.put(("processed", blob.name, extracted_text, None))
+                except Exception as e:
+                    results.put(("failed", blob.name, None, e))
+        finally:
+            results.put(_DONE)
+
+    ocr_threads = [threading.Thread(target=recognize, daemon=True) for _ in range(ocr_workers)]
+    for thread in [threading.Thread(target=produce, daemon=True)] + ocr_threads:
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < ocr_workers:
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+            else:
+                status, blob_name, extracted_text, error = item
+                summary[status] += 1
+                yield blob_name, extracted_text, error
+    finally:
+        stop.set()
+        # Let the OCR workers finish their current image, so the caller can close the store
+        for thread in ocr_threads:
+            thread.join()
+
+def extract_text_from_images(blob_service_client, container_name, **pipeline_options):
+    extracted_data = {}
+    for blob_name, extracted_text, error in iter_extract_text_from_images(blob_service_client, container_name,
+                                                                          **pipeline_options):
+        if blob_name is None:
+            return f"Error: {error}"
+        extracted_data[blob_name] = extracted_text if error is None else f"Error: {error}"
     return extracted_data
 
 #Step 5: Build the Streamlit App
 
-import streamlit as st
 from PIL import Image
 def main():
     st.title("Azure Blob Storage Manager")
@@ -78,17 +190,65 @@ def main():
     elif choice == "Upload Images":
         container_name = st.text_input("Enter Container Name")
         uploaded_files = st.file_uploader("Upload Images", accept_multiple_files=True, type=["jpg", "png", "jpeg"])
+        upload_workers = st.number_input("Parallel uploads", min_value=1, max_value=64, value=8)
         if st.button("Upload"):
             blob_service_client = get_blob_service_client(connection_string)
-            result = upload_images_to_blob(blob_service_client, container_name, uploaded_files)
-            st.success(result)
+            container_client = blob_service_client.get_container_client(container_name)
+            total_bytes = sum(file.size for file in uploaded_files) or 1
+            overall = st.progress(0.0, text="Uploading...")
+            in_flight_status = st.empty()
+            in_flight, finished_bytes, summary = {}, 0, {}
+            for event in iter_upload_files(container_client, uploaded_files, max_workers=int(upload_workers),
+                                           summary=summary):
+                name = event["name"]
+                if event["event"] == "progress":
+                    in_flight[name] = (event["sent"], event["size"])
+                elif event["event"] == "done":
+                    in_flight.pop(name, None)
+                    finished_bytes += event["size"]
+                else:
+                    in_flight.pop(name, None)
+                    st.error(f"{name}: {event['error']}")
+                sent = finished_bytes + sum(done for done, _ in in_flight.values())
+                overall.progress(min(sent / total_bytes, 1.0),
+                                 text=f"{summary['succeeded']}/{len(uploaded_files)} files uploaded")
+                in_flight_status.text("\n".join(f"{file_name}: {done * 100 // max(size, 1)}%"
+                                                for file_name, (done, size) in in_flight.items()))
+            in_flight_status.empty()
+            if summary["failed"]:
+                st.warning(format_summary(summary))
+            else:
+                st.success(format_summary(summary))
 
     elif choice == "Extract Image Information":
         container_name = st.text_input("Enter Container Name")
+        download_workers = st.number_input("Parallel downloads", min_value=1, max_value=64, value=8)
+        ocr_workers = st.number_input("OCR workers", min_value=1, max_value=8, value=2)
+        force_refresh = st.checkbox("Force full refresh", help="Re-run OCR on every image, ignoring stored results")
         if st.button("Extract"):
             blob_service_client = get_blob_service_client(connection_string)
-            data = extract_text_from_images(blob_service_client, container_name)
-            st.write(data)
+            store = OcrResultStore(OCR_CACHE_PATH)
+            summary = {}
+            status = st.empty()
+            done = 0
+            try:
+                # Show each image's text as soon as it is ready instead of after the whole container
+                for blob_name, extracted_text, error in iter_extract_text_from_images(
+                        blob_service_client, container_name, download_workers=int(download_workers),
+                        ocr_workers=int(ocr_workers), store=store, force_refresh=force_refresh, summary=summary):
+                    if blob_name is None:
+                        st.error(f"Error: {error}")
+                        break
+                    done += 1
+                    status.info(f"Processed {done} images...")
+                    if error is None:
+                        st.write({blob_name: extracted_text})
+                    else:
+                        st.error(f"{blob_name}: {error}")
+            finally:
+                store.close()
+            status.success(f"{done} images: {summary['processed']} processed, "
+                           f"{summary['skipped']} unchanged (skipped), {summary['failed']} failed.")
     
     elif choice == "Show Container": 
         if st.button("Show"):
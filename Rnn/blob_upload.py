@@ -0,0 +1,188 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from azure.storage.blob import BlobBlock
+
+# Parallel, chunked uploads to a blob container
+#
+# Files are uploaded by a bounded pool of threads. Small files go up in one
+# upload_blob call; files above `single_put_limit` are split into `block_size` blocks
+# that are staged separately and committed with one commit_block_list, so a failed
+# block is retried on its own instead of re-sending the whole file. Progress events
+# are yielded to the caller's thread, which is where Streamlit has to draw them.
+
+BLOCK_SIZE = int(os.environ.get("BLOB_UPLOAD_BLOCK_SIZE", 4 * 1024 * 1024))
+SINGLE_PUT_LIMIT = int(os.environ.get("BLOB_UPLOAD_SINGLE_PUT_LIMIT", 8 * 1024 * 1024))
+
+_DONE = object()
+
+# File name and bytes of a Streamlit UploadedFile, an open file or a (name, bytes) pair
+def read_file(file):
+    if isinstance(file, tuple):
+        return file
+    if hasattr(file, "getvalue"):
+        return file.name, file.getvalue()
+    return os.path.basename(file.name), file.read()
+
+# Call `fn`, retrying with exponential backoff; `on_retry` is called before each retry
+def with_retries(fn, max_retries=3, backoff_s=0.5, on_retry=None):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            if on_retry is not None:
+                on_retry()
+            time.sleep(backoff_s * 2 ** attempt)
+
+def upload_one(container_client, name, data, block_size=BLOCK_SIZE, single_put_limit=SINGLE_PUT_LIMIT,
+               max_retries=3, backoff_s=0.5, on_bytes=None, on_retry=None):
+    on_bytes = on_bytes or (lambda sent: None)
+    blob_client = container_client.get_blob_client(name)
+    if len(data) <= single_put_limit:
+        with_retries(lambda: blob_client.upload_blob(data, overwrite=True), max_retries, backoff_s, on_retry)
+        on_bytes(len(data))
+        return
+
+    view = memoryview(data)
+    blocks = []
+    for index, start in enumerate(range(0, len(data), block_size)):
+        # Block ids must all have the same length within a blob
+        block_id = f"{index:08d}"
+        chunk = view[start:start + block_size]
+        with_retries(lambda: blob_client.stage_block(block_id, chunk.tobytes()), max_retries, backoff_s, on_retry)
+        blocks.append(BlobBlock(block_id=block_id))
+        on_bytes(len(chunk))
+    with_retries(lambda: blob_client.commit_block_list(blocks), max_retries, backoff_s, on_retry)
+
+# Upload `files` concurrently and stream progress events
+#
+# Yields dicts with "event" set to "progress" (name, sent, size) while a file is going
+# up, then "done" or "failed" (with "error") once per file. Pass a dict as `summary`
+# to get the aggregate counts, bytes, retries and MB/s / files/s when it finishes.
+def iter_upload_files(container_client, files, max_workers=8, block_size=BLOCK_SIZE,
+                      single_put_limit=SINGLE_PUT_LIMIT, max_retries=3, backoff_s=0.5, summary=None):
+    summary = summary if summary is not None else {}
+    summary.update(files=len(files), succeeded=0, failed=0, bytes=0, retries=0, errors={})
+    events = queue.Queue()
+    lock = threading.Lock()
+
+    def count_retry():
+        with lock:
+            summary["retries"] += 1
+
+    def upload(file):
+        name = getattr(file, "name", None) or file[0]
+        try:
+            name, data = read_file(file)
+            sent = 0
+
+            def on_bytes(count):
+                nonlocal sent
+                sent += count
+                events.put({"event": "progress", "name": name, "sent": sent, "size": len(data)})
+
+            upload_one(container_client, name, data, block_size, single_put_limit, max_retries, backoff_s,
+                       on_bytes, count_retry)
+            events.put({"event": "done", "name": name, "sent": len(data), "size": len(data)})
+        except Exception as e:
+            events.put({"event": "failed", "name": name, "error": e})
+
+    def run():
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for file in files:
+                pool.submit(upload, file)
+        events.put(_DONE)
+
+    started = time.perf_counter()
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            break
+        if event["event"] == "done":
+            summary["succeeded"] += 1
+            summary["bytes"] += event["size"]
+        elif event["event"] == "failed":
+            summary["failed"] += 1
+            summary["errors"][event["name"]] = str(event["error"])
+        yield event
+
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = elapsed
+    summary["mb_per_s"] = summary["bytes"] / 1e6 / elapsed if elapsed else 0.0
+    summary["files_per_s"] = summary["succeeded"] / elapsed if elapsed else 0.0
+
+def upload_files(container_client, files, **options):
+    summary = {}
+    for _ in iter_upload_files(container_client, files, summary=summary, **options):
+        pass
+    return summary
+
+def format_summary(summary):
+    text = (f"Uploaded {summary['succeeded']}/{summary['files']} files, {summary['bytes'] / 1e6:.1f} MB in "
+            f"{summary['seconds']:.1f}s ({summary['mb_per_s']:.2f} MB/s, {summary['files_per_s']:.1f} files/s)")
+    if summary["retries"]:
+        text += f", {summary['retries']} retries"
+    if summary["failed"]:
+        text += f", {summary['failed']} failed"
+    return text
+
+# Benchmark: sequential upload_blob calls vs. the parallel uploader
+#
+#   python blob_upload.py --files 200 --latency-ms 50
+#   python blob_upload.py --connection-string "UseDevelopmentStorage=true"   # Azurite
+#
+# Without a connection string the local storage backend (storage_backend.py) stands in
+# for Azure, with simulated per-request latency and random transient failures.
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    from storage_backend import LocalBlobServiceClient, get_blob_service_client
+
+    parser = argparse.ArgumentParser(description="Sequential vs. parallel blob upload throughput")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--large-mb", type=int, default=20, help="Size of one extra file uploaded in blocks")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--connection-string", default=None, help="Upload to a real account or Azurite instead")
+    parser.add_argument("--container", default="upload-benchmark")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    files = [(f"image_{i:05d}.jpg", rng.randbytes(args.size_kb * 1024)) for i in range(args.files)]
+    files.append(("large.tif", rng.randbytes(args.large_mb * 1024 * 1024)))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.connection_string:
+            service = get_blob_service_client(args.connection_string)
+            sequential_service = service
+        else:
+            service = LocalBlobServiceClient(scratch, args.latency_ms, args.failure_rate)
+            # The old loop had no retries, so the baseline runs without injected failures
+            sequential_service = LocalBlobServiceClient(scratch, args.latency_ms)
+        container_client = service.get_container_client(args.container)
+        sequential_client = sequential_service.get_container_client(args.container)
+        if not sequential_client.exists():
+            sequential_client.create_container()
+
+        started = time.perf_counter()
+        for name, data in files:
+            sequential_client.get_blob_client(name).upload_blob(data, overwrite=True)
+        sequential_s = time.perf_counter() - started
+
+        summary = upload_files(container_client, files, max_workers=args.workers)
+        print(f"sequential: {len(files) / sequential_s:7.1f} files/s")
+        print(f"parallel:   {format_summary(summary)} ({sequential_s / summary['seconds']:.1f}x)")
+        for name, error in summary["errors"].items():
+            print(f"  failed {name}: {error}")
+
+        for name, data in files:
+            assert sequential_client.get_blob_client(name).download_blob().readall() == data, f"{name} differs"
+        print("All uploaded files match their source bytes")
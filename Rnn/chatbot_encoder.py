@@ -0,0 +1,74 @@
+import numpy as np
+import torch
+
+# Batched BERT sentence encoder for the chatbot corpus and user queries
+#
+# Texts are tokenized once, sorted by token length and encoded in fixed-size padded
+# batches, so a batch pads only to its own longest text. Pooling is attention-mask
+# aware: padding positions are excluded from the mean, which keeps a text's embedding
+# the same whether it is encoded alone or next to longer texts.
+
+# Mean of the token vectors, ignoring padding
+def mean_pool(last_hidden_state, attention_mask):
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    return summed / mask.sum(dim=1).clamp(min=1e-9)
+
+# Encode `texts` into an (n, hidden_size) float32 array, in input order
+def encode_batch(texts, tokenizer, model, batch_size=32, max_length=128):
+    if isinstance(texts, str):
+        texts = [texts]
+    if not texts:
+        return np.empty((0, model.config.hidden_size), dtype=np.float32)
+    encoded = tokenizer(list(texts), truncation=True, max_length=max_length)["input_ids"]
+    order = sorted(range(len(texts)), key=lambda i: len(encoded[i]))
+
+    embeddings = np.empty((len(texts), model.config.hidden_size), dtype=np.float32)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        inputs = tokenizer.pad({"input_ids": [encoded[i] for i in indices]}, return_tensors="pt")
+        with torch.no_grad():
+            outputs = model(**inputs)
+        embeddings[indices] = mean_pool(outputs.last_hidden_state, inputs["attention_mask"]).numpy()
+    return embeddings
+
+# Throughput comparison: one forward pass per text vs. encode_batch
+#
+#   python chatbot_encoder.py --texts 1000 [--model bert-base-uncased]
+#
+# Without --model a small randomly-initialised BERT is used so it runs offline.
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    import time
+    from transformers import BertModel, BertTokenizer
+    from bert_backends import save_random_checkpoint
+
+    parser = argparse.ArgumentParser(description="Per-item vs. batched embedding throughput")
+    parser.add_argument("--model", default=None, help="Hugging Face model name or path (default: random tiny BERT)")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        model_path = args.model or save_random_checkpoint(scratch)
+        tokenizer = BertTokenizer.from_pretrained(model_path)
+        model = BertModel.from_pretrained(model_path)
+    model.eval()
+
+    rng = random.Random(0)
+    words = list(tokenizer.vocab)[1000:3000] if args.model else [f"w{i}" for i in range(2000)]
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 60))) for _ in range(args.texts)]
+
+    started = time.perf_counter()
+    per_item = np.vstack([encode_batch([text], tokenizer, model) for text in texts])
+    per_item_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = encode_batch(texts, tokenizer, model, batch_size=args.batch_size)
+    batched_s = time.perf_counter() - started
+
+    print(f"per-item: {args.texts / per_item_s:8.1f} texts/s")
+    print(f"batched:  {args.texts / batched_s:8.1f} texts/s ({per_item_s / batched_s:.1f}x)")
+    print(f"max |per-item - batched| = {np.abs(per_item - batched).max():.2e}")
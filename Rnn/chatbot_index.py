@@ -0,0 +1,312 @@
+import csv
+import json
+import os
+import time
+import numpy as np
+
+# Vectorized similarity search for the BERT FAQ chatbot
+#
+# All question embeddings live in one L2-normalized float32 matrix, so scoring a query
+# against the whole FAQ is a single matrix-vector product (cosine similarity == dot
+# product of unit vectors), and top-k selection is an argpartition instead of a sort.
+
+# Load QA pairs from a CSV (question,answer columns) or JSONL ({"question", "answer"}) file
+def load_qa_pairs(path):
+    extension = os.path.splitext(path)[1].lower()
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        if extension in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    pairs.append((item["question"], item["answer"]))
+        elif extension == ".csv":
+            for row in csv.DictReader(f):
+                pairs.append((row["question"], row["answer"]))
+        else:
+            raise ValueError(f"Unsupported QA file type '{extension}', expected .csv or .jsonl")
+    return pairs
+
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+# Indices and scores of the k largest entries of `scores`, best first
+def top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return order, scores[order]
+
+# Append-only array that doubles its capacity when full
+#
+# `extend` copies only the new rows (amortized O(1) per row) instead of the whole
+# array; `view` is the filled part. The initial array is used as-is until the first
+# extend outgrows it, so a read-only memory-mapped matrix is only copied then.
+class GrowableArray:
+    def __init__(self, initial):
+        self._data = initial
+        self._size = len(initial)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def view(self):
+        return self._data[:self._size]
+
+    def extend(self, values):
+        end = self._size + len(values)
+        if end > len(self._data):
+            dtype = self._data.dtype if self._size else values.dtype
+            grown = np.empty((max(end, 2 * len(self._data)),) + values.shape[1:], dtype=dtype)
+            if self._size:
+                grown[:self._size] = self.view
+            self._data = grown
+        self._data[self._size:end] = values
+        self._size = end
+
+class FaqIndex:
+    # Pass normalized=True for rows that are already unit length (e.g. a memory-mapped
+    # EmbeddingStore matrix) so they are used as-is instead of copied
+    def __init__(self, questions, answers, embeddings, normalized=False):
+        if len(questions) != len(answers) or len(questions) != len(embeddings):
+            raise ValueError("questions, answers and embeddings must have the same length")
+        self.questions = list(questions)
+        self.answers = list(answers)
+        self._matrix = GrowableArray(np.asarray(embeddings, dtype=np.float32) if normalized
+                                     else l2_normalize(embeddings))
+
+    # (n, dim) unit vectors, one row per question
+    @property
+    def matrix(self):
+        return self._matrix.view
+
+    # Build from (question, answer) pairs; `embed_fn` maps a list of texts to an (n, dim) array
+    @classmethod
+    def from_pairs(cls, pairs, embed_fn):
+        questions = [question for question, _ in pairs]
+        answers = [answer for _, answer in pairs]
+        return cls(questions, answers, embed_fn(questions))
+
+    def __len__(self):
+        return len(self.questions)
+
+    # Top-k (index, cosine similarity) pairs for one query embedding; none for an empty
+    # FAQ (its matrix may be (0, 0), without the embedding size)
+    def search(self, query_embedding, k=1):
+        if not len(self):
+            return []
+        query = l2_normalize(np.ravel(query_embedding))
+        indices, scores = top_k(self.matrix @ query, k)
+        return list(zip(indices.tolist(), scores.tolist()))
+
+    # Answer of the best match, or None when nothing is similar enough
+    def answer(self, query_embedding, threshold=0.5):
+        results = self.search(query_embedding, k=1)
+        if results and results[0][1] > threshold:
+            return self.answers[results[0][0]]
+        return None
+
+    # Append new QA pairs; returns their row ids
+    def add(self, questions, answers, embeddings):
+        vectors = l2_normalize(np.atleast_2d(embeddings))
+        start = len(self.questions)
+        self.questions.extend(questions)
+        self.answers.extend(answers)
+        self._matrix.extend(vectors)
+        return np.arange(start, start + len(vectors))
+
+# Spherical k-means on unit vectors; returns (n_lists, dim) unit centroids
+def train_centroids(vectors, n_lists, iterations=10, sample_size=None, seed=0):
+    rng = np.random.default_rng(seed)
+    sample_size = sample_size or min(len(vectors), 256 * n_lists)
+    sample = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random points so every list stays in use
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+# Nearest centroid (highest cosine) for every vector, computed in chunks
+def assign_lists(vectors, centroids, chunk_size=65536):
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        assignment[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignment
+
+# Approximate nearest-neighbour index (IVF-flat) behind the FaqIndex interface
+#
+# Questions are clustered into `n_lists` inverted lists around k-means centroids. A query
+# is scored only against the members of the `n_probe` lists whose centroids are closest,
+# trading a little recall for scanning a fraction of the matrix. New QA pairs are added
+# to their nearest existing list, so inserting does not require re-clustering.
+class IVFIndex(FaqIndex):
+    def __init__(self, questions, answers, embeddings, n_lists=None, n_probe=8, normalized=False,
+                 centroids=None, seed=0):
+        super().__init__(questions, answers, embeddings, normalized)
+        self.n_probe = n_probe
+        if centroids is None:
+            n_lists = n_lists or max(1, int(np.sqrt(len(self.matrix))))
+            centroids = train_centroids(self.matrix, min(n_lists, len(self.matrix)), seed=seed)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self._build_lists(assign_lists(self.matrix, self.centroids))
+
+    def _build_lists(self, assignment):
+        self._assignment = GrowableArray(np.asarray(assignment, dtype=np.int64))
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        self.lists = [GrowableArray(order[bounds[i]:bounds[i + 1]]) for i in range(len(self.centroids))]
+
+    # Inverted-list id of every row
+    @property
+    def assignment(self):
+        return self._assignment.view
+
+    def search(self, query_embedding, k=1, n_probe=None):
+        query = l2_normalize(np.ravel(query_embedding))
+        probe, _ = top_k(self.centroids @ query, n_probe or self.n_probe)
+        candidates = np.concatenate([self.lists[i].view for i in probe])
+        if len(candidates) == 0:
+            return []
+        positions, scores = top_k(self.matrix[candidates] @ query, k)
+        return list(zip(candidates[positions].tolist(), scores.tolist()))
+
+    def add(self, questions, answers, embeddings):
+        ids = super().add(questions, answers, embeddings)
+        new_assignment = assign_lists(self.matrix[ids], self.centroids)
+        self._assignment.extend(new_assignment)
+        for list_id in np.unique(new_assignment):
+            self.lists[list_id].extend(ids[new_assignment == list_id])
+        return ids
+
+    # Save to a directory: vectors/centroids/assignment in .npz, QA text in JSON
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, "ivf.npz"), matrix=self.matrix, centroids=self.centroids,
+                 assignment=self.assignment)
+        with open(os.path.join(directory, "qa.json"), "w", encoding="utf-8") as f:
+            json.dump({"questions": self.questions, "answers": self.answers, "n_probe": self.n_probe}, f)
+
+    @classmethod
+    def load(cls, directory):
+        arrays = np.load(os.path.join(directory, "ivf.npz"))
+        with open(os.path.join(directory, "qa.json"), encoding="utf-8") as f:
+            qa = json.load(f)
+        index = cls.__new__(cls)
+        FaqIndex.__init__(index, qa["questions"], qa["answers"], arrays["matrix"], normalized=True)
+        index.n_probe = qa["n_probe"]
+        index.centroids = arrays["centroids"]
+        index._build_lists(arrays["assignment"])
+        return index
+
+# Recall@k of `index` against exact search, and mean latency per query for both
+def evaluate_recall(index, exact, queries, k=10, **search_kwargs):
+    hits = 0
+    ann_s = exact_s = 0.0
+    for query in queries:
+        started = time.perf_counter()
+        approximate = {i for i, _ in index.search(query, k, **search_kwargs)}
+        ann_s += time.perf_counter() - started
+        started = time.perf_counter()
+        truth = {i for i, _ in exact.search(query, k)}
+        exact_s += time.perf_counter() - started
+        hits += len(approximate & truth)
+    return {
+        "recall": hits / (k * len(queries)),
+        "ann_ms": ann_s * 1000.0 / len(queries),
+        "exact_ms": exact_s * 1000.0 / len(queries),
+    }
+
+# Synthetic clustered embeddings (FAQ questions come in topics, unlike uniform noise)
+def _clustered_vectors(rng, size, dim, topics=256, spread=0.5):
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    members = centers[rng.integers(0, topics, size)]
+    return members + spread * rng.standard_normal((size, dim)).astype(np.float32)
+
+# Benchmark: query latency vs. corpus size, against the old one-comparison-per-question loop
+# (sklearn's cosine_similarity per question, as bert_chatbot.py did; needs scikit-learn)
+#
+#   python chatbot_index.py --sizes 1000 10000 50000
+#   python chatbot_index.py --ann --sizes 200000        # IVF recall@k vs. latency
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FAQ index query latency vs. corpus size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--loop-limit", type=int, default=1000, help="Skip the per-question loop above this size")
+    parser.add_argument("--ann", action="store_true", help="Evaluate the IVF index against exact search")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--inserts", type=int, default=10000, help="Single-pair inserts timed after the IVF build")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.ann:
+        for size in args.sizes:
+            embeddings = _clustered_vectors(rng, size, args.dim)
+            queries = embeddings[rng.choice(size, args.queries, replace=False)]
+            queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+            exact = FaqIndex([str(i) for i in range(size)], [""] * size, embeddings)
+            started = time.perf_counter()
+            ivf = IVFIndex(exact.questions, exact.answers, exact.matrix, normalized=True)
+            print(f"{size} questions, {len(ivf.centroids)} lists, built in {time.perf_counter() - started:.1f}s")
+            for n_probe in args.n_probe:
+                result = evaluate_recall(ivf, exact, queries, args.k, n_probe=n_probe)
+                print(f"  n_probe {n_probe:>3}: recall@{args.k} {result['recall']:.3f}  "
+                      f"ivf {result['ann_ms']:7.3f} ms  exact {result['exact_ms']:7.3f} ms")
+            # One QA pair at a time, as the chatbot adds them
+            added = _clustered_vectors(rng, args.inserts, args.dim)
+            started = time.perf_counter()
+            for vector in added:
+                ivf.add(["new"], [""], vector)
+            print(f"  {args.inserts} single inserts: {(time.perf_counter() - started) * 1e6 / args.inserts:.1f} us/insert")
+        raise SystemExit(0)
+
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity
+    except ImportError:
+        cosine_similarity = None
+        print("scikit-learn is not installed; skipping the per-question cosine_similarity baseline")
+
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    for size in args.sizes:
+        embeddings = rng.standard_normal((size, args.dim)).astype(np.float32)
+        index = FaqIndex([str(i) for i in range(size)], [""] * size, embeddings)
+
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, args.k)
+        vectorized_ms = (time.perf_counter() - started) * 1000.0 / args.queries
+
+        line = f"{size:>8} questions: vectorized {vectorized_ms:8.3f} ms/query"
+        if cosine_similarity is not None and size <= args.loop_limit:
+            # The previous approach: a dict of (1, dim) embeddings keyed by question, one
+            # cosine_similarity call per question, then max()
+            predefined_embeddings = {question: embeddings[i:i + 1] for i, question in enumerate(index.questions)}
+            started = time.perf_counter()
+            for query in queries:
+                user_embedding = query[None, :]
+                similarities = {
+                    question: cosine_similarity(user_embedding, predefined_embeddings[question])[0][0]
+                    for question in predefined_embeddings
+                }
+                max(similarities, key=similarities.get)
+            loop_ms = (time.perf_counter() - started) * 1000.0 / args.queries
+            line += f" | per-question loop {loop_ms:8.3f} ms/query ({loop_ms / vectorized_ms:.0f}x slower)"
+        print(line)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+# Persistent on-disk embedding store for the chatbot corpus
+#
+# Embeddings are kept in one float32 .npy matrix per model, opened with mmap so a
+# restart (or a Streamlit rerun) maps the file instead of re-encoding the corpus. A JSON
+# index maps sha256(text) -> row. Only texts whose hash is not in the index are sent
+# through the model; their rows are appended and the files replaced atomically. With
+# compact=True, rows of texts no longer in the corpus (deleted or edited questions) are
+# dropped and the rest rewritten in corpus order, so the file doesn't grow forever.
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+class EmbeddingStore:
+    def __init__(self, directory, model_name, normalize=True):
+        self.directory = directory
+        self.model_name = model_name
+        self.normalize = normalize
+        self.matrix_path = os.path.join(directory, f"{_slug(model_name)}.npy")
+        self.index_path = os.path.join(directory, f"{_slug(model_name)}.json")
+        self.rows = {}
+        self.matrix = None
+        self.last_embedded = 0  # Texts sent through the model by the last get_or_embed()
+        self._load()
+
+    # Zero-copy startup: map the matrix read-only and read the small JSON index
+    def _load(self):
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.index_path)):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("model") != self.model_name:
+            return
+        self.rows = index["rows"]
+        self.matrix = np.load(self.matrix_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Return an (n, dim) array for `texts`, embedding only the ones not stored yet
+    #
+    # `embed_fn` maps a list of texts to an (n, dim) array. When the texts are exactly
+    # the stored rows in order, the result is a view of the memory-mapped file. Pass
+    # compact=True when `texts` is the whole corpus to drop the rows of other texts.
+    def get_or_embed(self, texts, embed_fn, compact=False):
+        if not texts and self.matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        hashes = [text_hash(text) for text in texts]
+        missing, seen = [], set()
+        for text, digest in zip(texts, hashes):
+            if digest not in self.rows and digest not in seen:
+                missing.append(text)
+                seen.add(digest)
+        self.last_embedded = len(missing)
+        if missing:
+            self._append([text_hash(text) for text in missing], embed_fn(missing))
+        if compact:
+            self.compact(hashes)
+
+        rows = [self.rows[digest] for digest in hashes]
+        if rows == list(range(len(rows))):
+            return self.matrix[:len(rows)]
+        return self.matrix[rows]
+
+    # Keep only the rows of `hashes` (text hashes), stored in that order
+    #
+    # Returns the number of rows dropped; nothing is rewritten when the store already
+    # holds exactly these rows in this order.
+    def compact(self, hashes):
+        keep = list(dict.fromkeys(digest for digest in hashes if digest in self.rows))
+        if self.matrix is None or [self.rows[digest] for digest in keep] == list(range(len(self.matrix))):
+            return 0
+        old_rows = [self.rows[digest] for digest in keep]
+        dropped = len(self.matrix) - len(keep)
+
+        def fill(compacted):
+            # Copy in chunks so a large mapped matrix is never fully loaded
+            for start in range(0, len(old_rows), 65536):
+                compacted[start:start + 65536] = self.matrix[old_rows[start:start + 65536]]
+        self._replace({digest: row for row, digest in enumerate(keep)}, (len(keep), self.matrix.shape[1]), fill)
+        return dropped
+
+    def _append(self, hashes, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(hashes), -1)
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        start = 0 if self.matrix is None else len(self.matrix)
+        if self.matrix is not None and self.matrix.shape[1] != vectors.shape[1]:
+            raise ValueError(f"Embedding size changed from {self.matrix.shape[1]} to {vectors.shape[1]}")
+
+        def fill(grown):
+            if self.matrix is not None:
+                grown[:start] = self.matrix
+            grown[start:] = vectors
+        rows = dict(self.rows)
+        for offset, digest in enumerate(hashes):
+            rows[digest] = start + offset
+        self._replace(rows, (start + len(vectors), vectors.shape[1]), fill)
+
+    # Write a new matrix (filled by `fill`) and index to temporary files, then swap them in
+    def _replace(self, rows, shape, fill):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_matrix = self.matrix_path + ".tmp.npy"
+        replacement = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=shape)
+        fill(replacement)
+        replacement.flush()
+        del replacement
+
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": int(shape[1]), "rows": rows}, f)
+
+        self.matrix = None  # Release the old mapping before replacing the file
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_index, self.index_path)
+        self.rows = rows
+        self.matrix = np.load(self.matrix_path, mmap_mode="r")
@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import time
+
+# Persistent OCR result store for incremental container scans
+#
+# One row per (container, blob name) with the blob's ETag and last-modified time at
+# the moment it was processed. A re-run only needs to download and OCR blobs whose
+# ETag (or last-modified time, when no ETag is available) changed since then.
+
+class OcrResultStore:
+    def __init__(self, path="ocr_results.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS ocr_results (
+                       container TEXT NOT NULL,
+                       blob_name TEXT NOT NULL,
+                       etag TEXT,
+                       last_modified TEXT,
+                       text TEXT NOT NULL,
+                       processed_at REAL NOT NULL,
+                       PRIMARY KEY (container, blob_name)
+                   )"""
+            )
+
+    # All stored results of a container: {blob_name: (etag, last_modified, text)}
+    def load(self, container):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT blob_name, etag, last_modified, text FROM ocr_results WHERE container = ?", (container,)
+            ).fetchall()
+        return {blob_name: (etag, last_modified, text) for blob_name, etag, last_modified, text in rows}
+
+    def save(self, container, blob_name, etag, last_modified, text):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?, ?, ?)",
+                (container, blob_name, etag, _as_text(last_modified), text, time.time()),
+            )
+
+    # Drop results for blobs that no longer exist in the container
+    def prune(self, container, present_blob_names):
+        stored = set(self.load(container))
+        gone = stored - set(present_blob_names)
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM ocr_results WHERE container = ? AND blob_name = ?", [(container, name) for name in gone]
+            )
+        return len(gone)
+
+    def clear(self, container=None):
+        with self._lock, self._connection:
+            if container is None:
+                self._connection.execute("DELETE FROM ocr_results")
+            else:
+                self._connection.execute("DELETE FROM ocr_results WHERE container = ?", (container,))
+
+    def close(self):
+        self._connection.close()
+
+def _as_text(value):
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+# True when a stored result still matches the blob's current version
+def is_unchanged(stored, etag, last_modified):
+    if stored is None:
+        return False
+    stored_etag, stored_last_modified, _ = stored
+    if etag is not None or stored_etag is not None:
+        return etag == stored_etag
+    return last_modified is not None and _as_text(last_modified) == stored_last_modified
@@ -0,0 +1,64 @@
+import json
+import math
+import os
+import platform
+
+# Helpers shared by the benchmarks (bert_benchmark.py, bert_quantize.py,
+# storage_benchmark.py) and the micro-batcher's stats
+#
+# A benchmark builds a report dict, then `finish_report` writes it and either stores it
+# as the new baseline (--update-baseline) or compares it against --baseline with the
+# benchmark's own `compare(report, baseline, threshold)` and exits non-zero on a
+# regression.
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def host_info():
+    return {"platform": platform.platform(), "cpu_count": os.cpu_count(), "python": platform.python_version()}
+
+def add_report_arguments(parser, report_default, threshold_default):
+    parser.add_argument("--report", default=report_default)
+    parser.add_argument("--baseline", default=None, help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=threshold_default,
+                        help=f"Allowed relative regression ({threshold_default} = {threshold_default * 100:.0f}%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Also write the report to --baseline")
+
+# Call after parse_args(): --update-baseline needs to know where the baseline goes
+def check_report_arguments(parser, args):
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline requires --baseline")
+
+# Write the report, then update or check the baseline
+#
+# `same_setup` lists report keys that should match the baseline's (model, backend...);
+# a mismatch is only warned about, since the numbers may still be worth comparing.
+def finish_report(report, args, compare, same_setup=()):
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+    if not args.baseline:
+        return
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    for key in same_setup:
+        if baseline.get(key) != report.get(key):
+            print(f"Warning: baseline {key} {baseline.get(key)} differs from {report.get(key)}")
+    failures = compare(report, baseline, args.threshold)
+    if failures:
+        print("Performance regression:")
+        for failure in failures:
+            print(f"  - {failure}")
+        raise SystemExit(1)
+    print(f"No regression beyond {args.threshold:.0%} against {args.baseline}")
@@ -0,0 +1,224 @@
+import datetime
+import os
+import random
+import shutil
+import threading
+import time
+from urllib.parse import urlparse
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError, ServiceRequestError
+
+# Pluggable blob storage for the Azure apps
+#
+# The apps only use a small part of the azure-storage-blob client API (service ->
+# container -> blob clients, list/upload/download/properties/blocks). The Azure backend
+# is the SDK itself; the local backend implements the same calls on a directory, one
+# sub-directory per container, and sleeps `latency_ms` per request to mimic a remote
+# round trip (`failure_rate` additionally fails that share of requests, for retry
+# tests). Errors are raised as the SDK's ResourceExistsError/ResourceNotFoundError, so
+# the apps handle both backends with the same code.
+#
+# Pick the backend with the connection string:
+# "local:///path/to/root?latency_ms=20&failure_rate=0.01" selects the local one,
+# anything else goes to Azure. BLOB_STORAGE_URL overrides the connection string the
+# app was given.
+
+STORAGE_URL = os.environ.get("BLOB_STORAGE_URL")
+
+def get_blob_service_client(connection_string=None):
+    connection_string = STORAGE_URL or connection_string
+    if not connection_string:
+        raise ValueError("No blob storage connection string: pass one or set BLOB_STORAGE_URL "
+                         "(e.g. local:///tmp/blobs for the local backend)")
+    if connection_string.startswith("local://"):
+        parsed = urlparse(connection_string)
+        options = dict(part.split("=", 1) for part in parsed.query.split("&") if "=" in part)
+        return LocalBlobServiceClient(parsed.netloc + parsed.path, latency_ms=float(options.get("latency_ms", 0)),
+                                      failure_rate=float(options.get("failure_rate", 0)))
+    from azure.storage.blob import BlobServiceClient
+    return BlobServiceClient.from_connection_string(connection_string)
+
+class _Item:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+class _Download:
+    def __init__(self, data):
+        self._data = data
+
+    def readall(self):
+        return self._data
+
+def _read(data):
+    if hasattr(data, "read"):
+        data = data.read()
+    return bytes(data)
+
+class LocalBlobServiceClient:
+    def __init__(self, root, latency_ms=0.0, failure_rate=0.0, seed=0):
+        self.root = os.path.abspath(root)
+        self.latency_s = latency_ms / 1000.0
+        self.failure_rate = failure_rate
+        self.requests = 0  # Simulated round trips so far
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # One simulated round trip
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+            failed = self.failure_rate and self._rng.random() < self.failure_rate
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if failed:
+            raise ServiceRequestError("Simulated transient storage failure")
+
+    def list_containers(self):
+        self._request()
+        return [_Item(name=name) for name in sorted(os.listdir(self.root))
+                if os.path.isdir(os.path.join(self.root, name)) and not name.startswith(".")]
+
+    def get_container_client(self, container_name):
+        return LocalContainerClient(self, container_name)
+
+    def create_container(self, container_name):
+        container_client = self.get_container_client(container_name)
+        container_client.create_container()
+        return container_client
+
+    def delete_container(self, container_name):
+        self.get_container_client(container_name).delete_container()
+
+class LocalContainerClient:
+    def __init__(self, service, container_name):
+        self.service = service
+        self.container_name = container_name
+        self.directory = os.path.join(service.root, container_name)
+
+    def exists(self):
+        self.service._request()
+        return os.path.isdir(self.directory)
+
+    def create_container(self):
+        self.service._request()
+        try:
+            os.makedirs(self.directory)
+        except FileExistsError:
+            raise ResourceExistsError(f"The specified container already exists: {self.container_name}")
+
+    def delete_container(self):
+        self.service._request()
+        if not os.path.isdir(self.directory):
+            raise ResourceNotFoundError(f"The specified container does not exist: {self.container_name}")
+        shutil.rmtree(self.directory)
+
+    def _require(self):
+        if not os.path.isdir(self.directory):
+            raise ResourceNotFoundError(f"The specified container does not exist: {self.container_name}")
+
+    def list_blobs(self):
+        self.service._request()
+        self._require()
+        blobs = []
+        for directory, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                blobs.append(_blob_properties(os.path.relpath(path, self.directory).replace(os.sep, "/"), path))
+        return sorted(blobs, key=lambda blob: blob.name)
+
+    def get_blob_client(self, blob):
+        return LocalBlobClient(self, getattr(blob, "name", blob))
+
+    def upload_blob(self, name, data, overwrite=False):
+        blob_client = self.get_blob_client(name)
+        blob_client.upload_blob(data, overwrite=overwrite)
+        return blob_client
+
+    def delete_blob(self, blob):
+        self.get_blob_client(blob).delete_blob()
+
+def _blob_properties(name, path):
+    stat = os.stat(path)
+    return _Item(
+        name=name,
+        size=stat.st_size,
+        etag=f'"0x{stat.st_mtime_ns:X}{stat.st_size:X}"',
+        last_modified=datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc),
+    )
+
+class LocalBlobClient:
+    def __init__(self, container, blob_name):
+        self.container = container
+        self.blob_name = blob_name
+        self.path = os.path.join(container.directory, blob_name)
+        # Staged blocks and partial writes live outside the container so listings never see them
+        self._blocks_dir = os.path.join(container.service.root, ".blocks", container.container_name, blob_name)
+        self._tmp_dir = os.path.join(container.service.root, ".tmp")
+
+    def _write(self, data):
+        # Write to a temporary file and rename, so readers never see a partial blob
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = os.path.join(self._tmp_dir, f"{os.getpid()}-{threading.get_ident()}")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def exists(self):
+        self.container.service._request()
+        return os.path.isfile(self.path)
+
+    def upload_blob(self, data, overwrite=False):
+        self.container.service._request()
+        self.container._require()
+        if not overwrite and os.path.exists(self.path):
+            raise ResourceExistsError(f"The specified blob already exists: {self.blob_name}")
+        self._write(_read(data))
+        return self._result()
+
+    # What the SDK returns from upload_blob/commit_block_list
+    def _result(self):
+        properties = _blob_properties(self.blob_name, self.path)
+        return {"etag": properties.etag, "last_modified": properties.last_modified}
+
+    def download_blob(self):
+        self.container.service._request()
+        try:
+            with open(self.path, "rb") as f:
+                return _Download(f.read())
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+
+    def get_blob_properties(self):
+        self.container.service._request()
+        if not os.path.isfile(self.path):
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+        return _blob_properties(self.blob_name, self.path)
+
+    def delete_blob(self):
+        self.container.service._request()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+
+    def stage_block(self, block_id, data, length=None):
+        self.container.service._request()
+        self.container._require()
+        os.makedirs(self._blocks_dir, exist_ok=True)
+        with open(os.path.join(self._blocks_dir, block_id), "wb") as f:
+            f.write(_read(data))
+
+    def commit_block_list(self, block_list):
+        self.container.service._request()
+        parts = []
+        for block in block_list:
+            block_id = getattr(block, "id", block)
+            try:
+                with open(os.path.join(self._blocks_dir, block_id), "rb") as f:
+                    parts.append(f.read())
+            except FileNotFoundError:
+                raise ResourceNotFoundError(f"The specified block list is invalid: {block_id} was not staged")
+        self._write(b"".join(parts))
+        shutil.rmtree(self._blocks_dir, ignore_errors=True)
+        return self._result()
@@ -0,0 +1,180 @@
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from perf_utils import add_report_arguments, check_report_arguments, finish_report, host_info
+from storage_backend import LocalBlobServiceClient, get_blob_service_client
+
+# Benchmark suite for the blob storage pipelines
+#
+#   python storage_benchmark.py --report storage_bench.json
+#   python storage_benchmark.py --baseline storage_baseline.json          # measure and compare
+#   python storage_benchmark.py --baseline storage_baseline.json --update-baseline
+#   python storage_benchmark.py --latency-ms 40 --files 500 --real-ocr
+#   python storage_benchmark.py --connection-string "UseDevelopmentStorage=true"   # Azurite
+#
+# Measures container listing, bulk upload (old sequential loop vs. blob_upload) and bulk
+# extract (blob_app pipeline, cold and incremental) against the local storage backend
+# with a simulated round-trip latency, so no cloud account is needed. OCR is faked with
+# a fixed per-image delay unless --real-ocr is given. With --baseline it exits non-zero
+# when a throughput drops by more than --threshold.
+
+# Small PNGs with a line of text, so --real-ocr has something to read
+def make_images(count, seed=0):
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    words = "invoice total amount date order number customer address payment due paid".split()
+    images = []
+    for i in range(count):
+        image = Image.new("RGB", (320, 64), "white")
+        ImageDraw.Draw(image).text((10, 24), " ".join(rng.choice(words) for _ in range(4)), fill="black")
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        images.append((f"image_{i:05d}.png", buffer.getvalue()))
+    return images
+
+# Stand-in for easyocr.Reader with a fixed cost per image
+class FakeOcrReader:
+    def __init__(self, ocr_ms):
+        self.ocr_s = ocr_ms / 1000.0
+
+    def readtext(self, image_data):
+        time.sleep(self.ocr_s)
+        return [(None, f"{len(image_data)} bytes", 1.0)]
+
+def _rate(count, seconds):
+    return round(count / seconds, 2) if seconds else 0.0
+
+def bench_listing(service, container_name, repeats):
+    container_client = service.get_container_client(container_name)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        [container.name for container in service.list_containers()]
+    containers_s = (time.perf_counter() - started) / repeats
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        blobs = [blob.name for blob in container_client.list_blobs()]
+    blobs_s = (time.perf_counter() - started) / repeats
+    return {
+        "list_containers_ms": round(containers_s * 1000.0, 2),
+        "list_blobs_ms": round(blobs_s * 1000.0, 2),
+        "blobs_listed_per_s": _rate(len(blobs), blobs_s),
+    }
+
+def bench_upload(service, container_name, images, workers):
+    from blob_upload import upload_files
+
+    # The old one-at-a-time loop writes to a scratch container, so extract sees each image once
+    sequential_client = service.get_container_client(f"{container_name}-sequential")
+    if not sequential_client.exists():
+        sequential_client.create_container()
+    started = time.perf_counter()
+    for name, data in images:
+        sequential_client.get_blob_client(name).upload_blob(data, overwrite=True)
+    sequential_s = time.perf_counter() - started
+    sequential_client.delete_container()
+
+    container_client = service.get_container_client(container_name)
+    summary = upload_files(container_client, images, max_workers=workers)
+    total_mb = sum(len(data) for _, data in images) / 1e6
+    return {
+        "sequential_files_per_s": _rate(len(images), sequential_s),
+        "parallel_files_per_s": round(summary["files_per_s"], 2),
+        "parallel_mb_per_s": round(summary["mb_per_s"], 2),
+        "sequential_mb_per_s": _rate(total_mb, sequential_s),
+        "failed": summary["failed"],
+    }
+
+def bench_extract(service, container_name, reader, download_workers, ocr_workers, scratch):
+    from blob_app import iter_extract_text_from_images
+    from ocr_cache import OcrResultStore
+
+    store = OcrResultStore(os.path.join(scratch, "ocr_results.db"))
+    result = {}
+    for run in ("cold", "incremental"):
+        summary = {}
+        started = time.perf_counter()
+        count = sum(1 for _ in iter_extract_text_from_images(
+            service, container_name, download_workers=download_workers, ocr_workers=ocr_workers,
+            reader=reader, store=store, summary=summary))
+        elapsed = time.perf_counter() - started
+        result[f"{run}_images_per_s"] = _rate(count, elapsed)
+        result[f"{run}_processed"] = summary["processed"]
+        result[f"{run}_failed"] = summary["failed"]
+    store.close()
+    return result
+
+def benchmark(args):
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.connection_string:
+            service = get_blob_service_client(args.connection_string)
+        else:
+            service = LocalBlobServiceClient(os.path.join(scratch, "storage"), latency_ms=args.latency_ms)
+        container_client = service.get_container_client(args.container)
+        if not container_client.exists():
+            container_client.create_container()
+
+        images = make_images(args.files)
+        if args.real_ocr:
+            import easyocr
+            reader = easyocr.Reader(["en"])
+        else:
+            reader = FakeOcrReader(args.ocr_ms)
+
+        results = {}
+        results["upload"] = bench_upload(service, args.container, images, args.upload_workers)
+        print(f"upload:  sequential {results['upload']['sequential_files_per_s']:8.1f} files/s  "
+              f"parallel {results['upload']['parallel_files_per_s']:8.1f} files/s "
+              f"({results['upload']['parallel_mb_per_s']:.2f} MB/s)")
+        results["listing"] = bench_listing(service, args.container, args.list_repeats)
+        print(f"listing: list_containers {results['listing']['list_containers_ms']:8.1f} ms  "
+              f"list_blobs {results['listing']['list_blobs_ms']:8.1f} ms "
+              f"({results['listing']['blobs_listed_per_s']:.0f} blobs/s)")
+        results["extract"] = bench_extract(service, args.container, reader, args.download_workers,
+                                           args.ocr_workers, scratch)
+        print(f"extract: cold {results['extract']['cold_images_per_s']:8.1f} images/s  "
+              f"incremental {results['extract']['incremental_images_per_s']:8.1f} images/s")
+        if args.connection_string:
+            container_client.delete_container()
+
+    return {
+        "backend": "azure" if args.connection_string else "local",
+        "latency_ms": None if args.connection_string else args.latency_ms,
+        "files": args.files,
+        "ocr": "easyocr" if args.real_ocr else f"fake-{args.ocr_ms}ms",
+        "host": host_info(),
+        "results": results,
+    }
+
+# Throughputs ("per_s" values) that dropped more than `threshold` below the baseline
+def compare(report, baseline, threshold):
+    failures = []
+    for section, values in report["results"].items():
+        for name, value in values.items():
+            previous = baseline.get("results", {}).get(section, {}).get(name)
+            if name.endswith("per_s") and previous and value < previous * (1 - threshold):
+                failures.append(f"{section}.{name}: {value} < baseline {previous}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listing, bulk upload and bulk extract throughput of the blob pipelines")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated round trip of the local backend")
+    parser.add_argument("--connection-string", default=None, help="Benchmark a real account or Azurite instead")
+    parser.add_argument("--container", default="storage-benchmark")
+    parser.add_argument("--upload-workers", type=int, default=16)
+    parser.add_argument("--download-workers", type=int, default=8)
+    parser.add_argument("--ocr-workers", type=int, default=2)
+    parser.add_argument("--ocr-ms", type=float, default=20.0, help="Per-image cost of the fake OCR reader")
+    parser.add_argument("--real-ocr", action="store_true", help="Run EasyOCR instead of the fake reader")
+    parser.add_argument("--list-repeats", type=int, default=10)
+    add_report_arguments(parser, "storage_bench.json", 0.15)
+    args = parser.parse_args()
+    check_report_arguments(parser, args)
+
+    report = benchmark(args)
+    finish_report(report, args, compare, same_setup=("backend", "latency_ms", "files", "ocr"))
@@ -0,0 +1,111 @@
+import math
+import pytest
+import torch
+from bert_longdoc import MAX_LENGTH, collate_windows, long_document_logits, pool_logits, split_windows
+
+CLS, SEP, PAD = 101, 102, 0
+
+# Whitespace tokenizer: "t5 t6" -> [5, 6]
+class FakeTokenizer:
+    cls_token_id = CLS
+    sep_token_id = SEP
+    pad_token_id = PAD
+
+    def __call__(self, text, add_special_tokens=False):
+        return {"input_ids": [int(word[1:]) for word in text.split()]}
+
+def make_text(n, offset=1000):
+    return " ".join(f"t{offset + i}" for i in range(n))
+
+# Logits that depend only on a window's real tokens, so results can be checked exactly
+def fake_logits(inputs):
+    ids = inputs["input_ids"].double() * inputs["attention_mask"]
+    return torch.stack([ids.sum(dim=1), inputs["attention_mask"].sum(dim=1).double()], dim=1)
+
+# Counts forward passes, so batching is checked without timing anything
+class CountingModel:
+    def __init__(self):
+        self.passes = 0
+
+    def __call__(self, inputs):
+        self.passes += 1
+        return fake_logits(inputs)
+
+@pytest.mark.parametrize("n", [1, 10, 18, 19, 50, 123])
+def test_windows_cover_the_document_with_overlap(n):
+    ids = list(range(1000, 1000 + n))
+    windows = split_windows(FakeTokenizer(), make_text(n), max_length=10, overlap=3)
+    content = [window[1:-1] for window in windows]
+    assert all(window[0] == CLS and window[-1] == SEP and len(window) <= 10 for window in windows)
+    # Consecutive windows share exactly `overlap` tokens, and stitching them back gives the document
+    stitched = list(content[0])
+    for previous, current in zip(content, content[1:]):
+        assert previous[-3:] == current[:3]
+        stitched += current[3:]
+    assert stitched == ids
+
+def test_short_and_empty_texts_give_one_window():
+    assert split_windows(FakeTokenizer(), make_text(4), max_length=10, overlap=3) == [[CLS, 1000, 1001, 1002, 1003, SEP]]
+    assert split_windows(FakeTokenizer(), "", max_length=10, overlap=3) == [[CLS, SEP]]
+
+def test_overlap_must_leave_room_for_new_tokens():
+    with pytest.raises(ValueError):
+        split_windows(FakeTokenizer(), make_text(50), max_length=10, overlap=8)
+
+def test_collate_pads_and_masks():
+    batch = collate_windows(FakeTokenizer(), [[CLS, 5, SEP], [CLS, SEP]])
+    assert batch["input_ids"].tolist() == [[CLS, 5, SEP], [CLS, SEP, PAD]]
+    assert batch["attention_mask"].tolist() == [[1, 1, 1], [1, 1, 0]]
+    assert batch["token_type_ids"].tolist() == [[0, 0, 0], [0, 0, 0]]
+
+def test_pooling_rules():
+    logits = torch.tensor([[1.0, 4.0], [3.0, 0.0]])
+    assert pool_logits(logits, [10, 30], "mean").tolist() == [2.0, 2.0]
+    assert pool_logits(logits, [10, 30], "max").tolist() == [3.0, 4.0]
+    assert pool_logits(logits, [10, 30], "length_weighted").tolist() == [2.5, 1.0]
+    with pytest.raises(ValueError):
+        pool_logits(logits, [10, 30], "median")
+
+@pytest.mark.parametrize("pooling", ["mean", "max", "length_weighted"])
+def test_batched_documents_match_one_at_a_time(pooling):
+    tokenizer = FakeTokenizer()
+    texts = [make_text(n, offset=1000 * (doc + 1)) for doc, n in enumerate([3, 40, 17, 95])]
+    batched = long_document_logits(texts, tokenizer, fake_logits, batch_size=4, pooling=pooling,
+                                   max_length=10, overlap=3)
+    for doc, text in enumerate(texts):
+        windows = split_windows(tokenizer, text, max_length=10, overlap=3)
+        expected = pool_logits(fake_logits(collate_windows(tokenizer, windows)), [len(w) for w in windows], pooling)
+        alone = long_document_logits([text], tokenizer, fake_logits, batch_size=1, pooling=pooling,
+                                     max_length=10, overlap=3)
+        assert torch.allclose(batched[doc], expected)
+        assert torch.allclose(batched[doc], alone[0])
+
+def test_5k_token_documents_share_forward_passes():
+    tokenizer = FakeTokenizer()
+    texts = [make_text(5000, offset=10000 * (doc + 1)) for doc in range(3)]
+    windows = [split_windows(tokenizer, text) for text in texts]
+    assert all(len(window) <= MAX_LENGTH for doc in windows for window in doc)
+    n_windows = sum(len(doc) for doc in windows)
+
+    batched = CountingModel()
+    first = long_document_logits(texts, tokenizer, batched, batch_size=16)
+    per_window = CountingModel()
+    alone = torch.stack([long_document_logits([text], tokenizer, per_window, batch_size=1)[0] for text in texts])
+    assert per_window.passes == n_windows
+    assert batched.passes == math.ceil(n_windows / 16) < n_windows
+    assert torch.equal(first, long_document_logits(texts, tokenizer, CountingModel(), batch_size=16))
+    assert torch.allclose(first, alone)
+
+def test_random_bert_is_deterministic_across_batching(tmp_path):
+    from transformers import BertTokenizer
+    from bert_backends import TorchBackend, save_random_checkpoint
+
+    save_random_checkpoint(str(tmp_path), hidden_size=32, num_layers=1, num_heads=2, vocab_words=200)
+    tokenizer = BertTokenizer.from_pretrained(str(tmp_path))
+    backend = TorchBackend(str(tmp_path))
+    texts = [" ".join(f"w{(i * 7 + doc) % 200}" for i in range(n)) for doc, n in enumerate([30, 1200, 5000])]
+
+    first = long_document_logits(texts, tokenizer, backend.logits, batch_size=4)
+    assert torch.equal(first, long_document_logits(texts, tokenizer, backend.logits, batch_size=4))
+    alone = torch.stack([long_document_logits([text], tokenizer, backend.logits, batch_size=1)[0] for text in texts])
+    assert torch.allclose(first, alone, atol=1e-4)
@@ -0,0 +1,30 @@
+import numpy as np
+from chatbot_index import FaqIndex, load_qa_pairs
+from embedding_store import EmbeddingStore
+
+def fake_embeddings(texts):
+    return np.stack([np.random.default_rng(sum(map(ord, text))).standard_normal(8) for text in texts])
+
+# What bert_chatbot.load_faq_index builds for a QA file with no rows
+def test_empty_qa_file_answers_nothing(tmp_path):
+    qa_path = tmp_path / "qa.csv"
+    qa_path.write_text("question,answer\n", encoding="utf-8")
+    pairs = load_qa_pairs(str(qa_path))
+    embeddings = EmbeddingStore(str(tmp_path / "store"), "bert").get_or_embed([q for q, _ in pairs], fake_embeddings)
+    index = FaqIndex([q for q, _ in pairs], [a for _, a in pairs], embeddings, normalized=True)
+    query = fake_embeddings(["hello"])[0]
+    assert index.search(query, k=3) == []
+    assert index.answer(query) is None
+
+def test_empty_index_grows(tmp_path):
+    index = FaqIndex([], [], np.empty((0, 0)), normalized=True)
+    index.add(["hello"], ["hi there"], fake_embeddings(["hello"]))
+    assert index.answer(fake_embeddings(["hello"])[0]) == "hi there"
+
+def test_search_ranks_by_cosine_similarity():
+    questions = [f"question {i}" for i in range(20)]
+    index = FaqIndex(questions, [f"answer {i}" for i in range(20)], fake_embeddings(questions))
+    results = index.search(fake_embeddings(["question 7"])[0], k=3)
+    assert results[0][0] == 7 and np.isclose(results[0][1], 1.0, atol=1e-5)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert index.answer(fake_embeddings(["question 7"])[0]) == "answer 7"
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+from embedding_store import EmbeddingStore
+
+# Deterministic stand-in for the BERT encoder that records what it was asked to embed
+class FakeEmbedder:
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([np.random.default_rng(sum(map(ord, text))).standard_normal(self.dim) for text in texts])
+
+@pytest.fixture
+def corpus():
+    return [f"question {i}" for i in range(50)]
+
+def test_second_start_reuses_the_stored_embeddings(tmp_path, corpus):
+    embed = FakeEmbedder()
+    first = EmbeddingStore(str(tmp_path), "bert").get_or_embed(corpus, embed)
+    second = EmbeddingStore(str(tmp_path), "bert").get_or_embed(corpus, embed)
+    assert len(embed.calls) == 1
+    assert isinstance(second, np.memmap) or isinstance(second.base, np.memmap)
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(second, axis=1), 1.0, atol=1e-5)
+
+def test_only_new_or_changed_texts_are_embedded(tmp_path, corpus):
+    embed = FakeEmbedder()
+    store = EmbeddingStore(str(tmp_path), "bert")
+    store.get_or_embed(corpus, embed)
+    changed = corpus[:-1] + ["an edited question", "question 3"]
+    result = store.get_or_embed(changed, embed)
+    assert embed.calls[1:] == [["an edited question"]]
+    assert store.last_embedded == 1
+    assert result.shape == (len(changed), 8)
+    assert np.array_equal(result[-1], result[3])
+
+def test_other_models_do_not_share_rows(tmp_path, corpus):
+    embed = FakeEmbedder()
+    EmbeddingStore(str(tmp_path), "bert").get_or_embed(corpus, embed)
+    EmbeddingStore(str(tmp_path), "distilbert").get_or_embed(corpus, embed)
+    assert len(embed.calls) == 2
+
+def test_embedding_size_change_is_rejected(tmp_path, corpus):
+    store = EmbeddingStore(str(tmp_path), "bert")
+    store.get_or_embed(corpus, FakeEmbedder(dim=8))
+    with pytest.raises(ValueError):
+        store.get_or_embed(["a new question"], FakeEmbedder(dim=16))
+
+def test_empty_query_on_a_fresh_store(tmp_path):
+    embed = FakeEmbedder()
+    result = EmbeddingStore(str(tmp_path), "bert").get_or_embed([], embed)
+    assert result.shape[0] == 0
+    assert embed.calls == []
+
+def test_empty_query_on_a_filled_store(tmp_path, corpus):
+    store = EmbeddingStore(str(tmp_path), "bert")
+    store.get_or_embed(corpus, FakeEmbedder())
+    assert store.get_or_embed([], FakeEmbedder()).shape == (0, 8)
+
+def test_compaction_drops_removed_questions(tmp_path, corpus):
+    embed = FakeEmbedder()
+    store = EmbeddingStore(str(tmp_path), "bert")
+    full = np.array(store.get_or_embed(corpus, embed))
+    size = os.path.getsize(store.matrix_path)
+
+    # Without compaction the rows of deleted questions stay in the file
+    store.get_or_embed(corpus[10:], embed)
+    assert len(store) == len(corpus)
+
+    kept = store.get_or_embed(corpus[10:], embed, compact=True)
+    assert len(store) == len(corpus) - 10
+    assert os.path.getsize(store.matrix_path) < size
+    assert np.array_equal(kept, full[10:])
+    assert isinstance(kept, np.memmap) or isinstance(kept.base, np.memmap), "compacted rows should be in corpus order"
+    assert len(embed.calls) == 1
+
+    # The compacted files are what the next start maps
+    reopened = EmbeddingStore(str(tmp_path), "bert")
+    assert np.array_equal(reopened.get_or_embed(corpus[10:], embed), full[10:])
+    assert len(embed.calls) == 1
+
+def test_compaction_after_edits_keeps_corpus_order(tmp_path, corpus):
+    embed = FakeEmbedder()
+    store = EmbeddingStore(str(tmp_path), "bert")
+    store.get_or_embed(corpus, embed)
+    edited = ["a brand new question"] + corpus[::-1][:20]
+    result = store.get_or_embed(edited, embed, compact=True)
+    assert len(store) == len(edited)
+    assert [store.rows[digest] for digest in sorted(store.rows, key=store.rows.get)] == list(range(len(edited)))
+    assert np.array_equal(result, store.get_or_embed(edited, embed))
+    assert embed.calls[1:] == [["a brand new question"]]
+
+def test_compaction_without_changes_does_not_rewrite(tmp_path, corpus):
+    store = EmbeddingStore(str(tmp_path), "bert")
+    store.get_or_embed(corpus, FakeEmbedder())
+    modified = os.stat(store.matrix_path).st_mtime_ns
+    store.get_or_embed(corpus, FakeEmbedder(), compact=True)
+    assert os.stat(store.matrix_path).st_mtime_ns == modified
@@ -0,0 +1,305 @@
+import time
+import cv2
+import numpy as np
+from video_pipeline import VideoPipeline, cascade_detector
+
+# Detect every N frames, track in between
+#
+# The cascade is the whole cost of the video scripts, while the objects barely move
+# from one frame to the next. TrackingPipeline only sends keyframes to the detector
+# threads: every `detect_every`-th frame, plus any frame whose downscaled grayscale
+# differs from the previous one by more than `scene_threshold` (a cut or a sudden
+# camera move). In between, the boxes are moved with pyramidal Lucas-Kanade optical
+# flow: corners inside each box are tracked forward and back, and the median shift and
+# spread of the points that come back give the new box.
+#
+# Each box carries a track ID. On a keyframe the tracked boxes are matched to the new
+# detections by IoU, so an object keeps its ID while the cascade keeps finding it;
+# tracks the cascade doesn't confirm are dropped after `max_missed` keyframes.
+
+THUMB_SIZE = (64, 48)  # Scene-change check resolution
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter)
+
+# Greedy one-to-one matching by IoU; returns [(index in a, index in b, iou)]
+def match_boxes(a, b, min_iou):
+    pairs = sorted(((iou(box_a, box_b), i, j) for i, box_a in enumerate(a) for j, box_b in enumerate(b)),
+                   reverse=True)
+    used_a, used_b, matches = set(), set(), []
+    for overlap, i, j in pairs:
+        if overlap < min_iou:
+            break
+        if i not in used_a and j not in used_b:
+            used_a.add(i)
+            used_b.add(j)
+            matches.append((i, j, overlap))
+    return matches
+
+# Points to follow inside a box: corners if there are enough, else a grid over its centre
+def box_points(gray, box, max_points=30):
+    x, y, w, h = (int(round(value)) for value in box)
+    x, y = max(x, 0), max(y, 0)
+    roi = gray[y:y + h, x:x + w]
+    if roi.shape[0] < 8 or roi.shape[1] < 8:
+        return np.empty((0, 2), np.float32)
+    corners = cv2.goodFeaturesToTrack(roi, maxCorners=max_points, qualityLevel=0.01, minDistance=4)
+    if corners is not None and len(corners) >= 4:
+        points = corners.reshape(-1, 2)
+    else:
+        xs, ys = np.meshgrid(np.linspace(0.25, 0.75, 5) * roi.shape[1], np.linspace(0.25, 0.75, 5) * roi.shape[0])
+        points = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    return (points + (x, y)).astype(np.float32)
+
+# Move boxes from prev_gray to gray; None for a box whose points were lost
+def flow_boxes(prev_gray, gray, boxes, fb_threshold=1.0, min_points=3):
+    point_sets = [box_points(prev_gray, box) for box in boxes]
+    if not any(len(points) for points in point_sets):
+        return [None] * len(boxes)
+    points = np.concatenate(point_sets).reshape(-1, 1, 2)
+    moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **LK_PARAMS)
+    back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, moved, None, **LK_PARAMS)
+    # Forward-backward check: keep points that return to where they started
+    good = (status.ravel() == 1) & (back_status.ravel() == 1) & \
+        (np.linalg.norm((back - points).reshape(-1, 2), axis=1) < fb_threshold)
+    points, moved = points.reshape(-1, 2), moved.reshape(-1, 2)
+
+    result, start = [], 0
+    for box, box_set in zip(boxes, point_sets):
+        keep = good[start:start + len(box_set)]
+        old, new = points[start:start + len(box_set)][keep], moved[start:start + len(box_set)][keep]
+        start += len(box_set)
+        if len(old) < min_points:
+            result.append(None)
+            continue
+        dx, dy = np.median(new - old, axis=0)
+        # Scale change: median ratio of the pairwise distances between the points
+        i, j = np.triu_indices(len(old), k=1)
+        before = np.linalg.norm(old[i] - old[j], axis=1)
+        after = np.linalg.norm(new[i] - new[j], axis=1)
+        valid = before > 1.0
+        scale = float(np.clip(np.median(after[valid] / before[valid]), 0.8, 1.25)) if valid.any() else 1.0
+        x, y, w, h = box
+        cx, cy = x + w / 2.0 + dx, y + h / 2.0 + dy
+        result.append((cx - w * scale / 2.0, cy - h * scale / 2.0, w * scale, h * scale))
+    return result
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = tuple(float(value) for value in box)
+        self.missed = 0
+
+class TrackingPipeline(VideoPipeline):
+    def __init__(self, source, detector_factory, detect_every=5, scene_threshold=25.0, min_iou=0.3,
+                 max_missed=0, **pipeline_options):
+        super().__init__(source, detector_factory, **pipeline_options)
+        self.detect_every = max(1, int(detect_every))
+        self.scene_threshold = scene_threshold
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.tracks = []
+        self.stats.update(keyframes=0, scene_changes=0, tracks=0)
+        self._next_id = 1
+        self._last_keyframe = None
+        self._prev_thumb = None
+        self._prev_gray = None
+
+    def is_keyframe(self, frame):
+        thumb = cv2.resize(cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY), THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        scene_change = self._prev_thumb is not None and \
+            cv2.absdiff(thumb, self._prev_thumb).mean() > self.scene_threshold
+        self._prev_thumb = thumb
+        scheduled = self._last_keyframe is None or frame.index - self._last_keyframe >= self.detect_every
+        if scheduled or scene_change:
+            self._last_keyframe = frame.index
+            self.stats["keyframes"] += 1
+            self.stats["scene_changes"] += not scheduled
+        return scheduled or scene_change
+
+    def _propagate(self, gray):
+        if self._prev_gray is None or not self.tracks:
+            return
+        kept = []
+        for track, box in zip(self.tracks, flow_boxes(self._prev_gray, gray, [t.box for t in self.tracks])):
+            if box is not None and box[2] >= 4 and box[3] >= 4:
+                track.box = box
+                kept.append(track)
+        self.tracks = kept
+
+    def _associate(self, detections):
+        detections = [tuple(float(value) for value in box) for box in detections]
+        matches = match_boxes([t.box for t in self.tracks], detections, self.min_iou)
+        matched_tracks = {i for i, _, _ in matches}
+        matched_detections = {j for _, j, _ in matches}
+        for i, j, _ in matches:
+            self.tracks[i].box = detections[j]
+            self.tracks[i].missed = 0
+        kept = [t for i, t in enumerate(self.tracks) if i in matched_tracks]
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.missed += 1
+                if track.missed <= self.max_missed:
+                    kept.append(track)
+        for j, box in enumerate(detections):
+            if j not in matched_detections:
+                kept.append(Track(self._next_id, box))
+                self._next_id += 1
+                self.stats["tracks"] += 1
+        self.tracks = kept
+
+    def on_frame(self, frame):
+        started = time.perf_counter()
+        gray = cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY)
+        # Tracks are moved onto every frame, keyframes included, so the IoU match compares
+        # boxes from the same frame
+        self._propagate(gray)
+        if frame.keyframe:
+            self._associate(frame.boxes)
+        self._prev_gray = gray
+        frame.boxes = [tuple(int(round(value)) for value in t.box) for t in self.tracks]
+        frame.track_ids = [t.id for t in self.tracks]
+        self.times.add("track", time.perf_counter() - started)
+
+    def _overlay_lines(self, fps):
+        return super()._overlay_lines(fps) + [
+            f"detect every {self.detect_every}  keyframes {self.stats['keyframes']}  "
+            f"track {self.times.mean_ms('track'):5.1f} ms"
+        ]
+
+    def _draw(self, frame, fps):
+        super()._draw(frame, fps)
+        for (x, y, _, _), track_id in zip(frame.boxes, getattr(frame, "track_ids", ())):
+            position = (int(x), max(int(y) - 5, 12))
+            cv2.putText(frame.image, f"#{track_id}", position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.box_color, 2,
+                        cv2.LINE_AA)
+
+    def run(self):
+        stats = super().run()
+        stats["track_ms"] = self.times.mean_ms("track")
+        return stats
+
+# Entry point used by the detection scripts; detect_every=1 runs the cascade on every
+# frame and only adds the track IDs. Raises RuntimeError if the cascade or the video
+# can't be opened.
+def run_tracked_video(source, cascade_path, window_name="Detection", detect_every=5, workers=2, policy="auto",
+                      show=True, output_path=None, box_color=(0, 255, 255), **detect_kwargs):
+    pipeline = TrackingPipeline(source, cascade_detector(cascade_path, **detect_kwargs), detect_every=detect_every,
+                                workers=workers, policy=policy, window_name=window_name, show=show,
+                                output_path=output_path, box_color=box_color)
+    print(f"Video opened successfully. Detecting every {pipeline.detect_every} frame(s) with {workers} workers "
+          f"({pipeline.policy} queues)...")
+    stats = pipeline.run()
+    print(f"{stats['displayed']} frames at {stats['fps']:.1f} FPS, {stats['keyframes']} keyframes "
+          f"({stats['scene_changes']} scene changes), {stats['tracks']} tracks, "
+          f"detect {stats['detect_ms']:.1f} ms/frame, track {stats['track_ms']:.1f} ms/frame")
+    return stats
+
+# Drawn faces moving across the frame with a cut halfway, for the report when no clip is given
+def synthetic_clip(path, frames=200, size=(640, 480)):
+    def face(image, cx, cy, s):
+        cv2.ellipse(image, (cx, cy), (int(40 * s), int(52 * s)), 0, 0, 360, (150, 180, 220), -1)
+        for dx in (-16, 16):
+            cv2.ellipse(image, (cx + int(dx * s), cy - int(12 * s)), (int(9 * s), int(5 * s)), 0, 0, 360,
+                        (30, 30, 30), -1)
+            cv2.line(image, (cx + int((dx - 10) * s), cy - int(24 * s)), (cx + int((dx + 10) * s), cy - int(24 * s)),
+                     (40, 40, 40), max(1, int(3 * s)))
+        cv2.line(image, (cx, cy - int(5 * s)), (cx, cy + int(12 * s)), (110, 130, 170), max(1, int(3 * s)))
+        cv2.ellipse(image, (cx, cy + int(28 * s)), (int(16 * s), int(5 * s)), 0, 0, 360, (60, 60, 120), -1)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25.0, size)
+    rng = np.random.default_rng(0)
+    for i in range(frames):
+        second_half = i >= frames // 2
+        image = np.full((size[1], size[0], 3), 70 if second_half else 120, np.uint8)
+        image = cv2.add(image, rng.integers(0, 6, image.shape, dtype=np.uint8))  # Sensor noise
+        t = i - frames // 2 if second_half else i
+        if second_half:
+            face(image, 520 - 2 * t, 260, 1.3)
+        else:
+            face(image, 120 + 2 * t, 220 + t // 4, 1.2 + t * 0.002)
+            face(image, 460, 140 + t, 1.0)
+        writer.write(image)
+    writer.release()
+    return path
+
+# Accuracy vs. FPS of detect-every-N against running the cascade on every frame, headless
+#
+#   python video_tracking.py --source cars.avi --cascade haarcascade_car.xml --every 2 5 10
+#
+# Every-frame detection is the reference: a tracked box counts as correct when it
+# overlaps a reference box of the same frame with IoU >= --match-iou. Without --source a
+# synthetic clip of drawn faces is used with OpenCV's bundled frontal face cascade.
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Detect-every-N with tracking vs. every-frame cascade detection")
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--cascade", default=None)
+    parser.add_argument("--every", type=int, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--scale-factor", type=float, default=1.1)
+    parser.add_argument("--min-neighbors", type=int, default=3)
+    parser.add_argument("--min-size", type=int, default=30)
+    parser.add_argument("--match-iou", type=float, default=0.5)
+    parser.add_argument("--show", action="store_true", help="Display the tracked output")
+    args = parser.parse_args()
+    if args.source and not args.cascade:
+        parser.error("--cascade is required with --source")
+
+    class Recorder:
+        def on_frame(self, frame):
+            super().on_frame(frame)
+            self.history[frame.index] = list(frame.boxes)
+
+    class RecordedPipeline(Recorder, VideoPipeline):
+        history = None
+
+    class RecordedTracking(Recorder, TrackingPipeline):
+        history = None
+
+    def run(pipeline_class, **options):
+        pipeline = pipeline_class(source, detector, workers=args.workers, policy="block", max_frames=args.frames,
+                                  **options)
+        pipeline.history = {}
+        return pipeline.run(), pipeline.history
+
+    with tempfile.TemporaryDirectory() as scratch:
+        source = args.source or synthetic_clip(os.path.join(scratch, "synthetic.avi"), args.frames)
+        cascade = args.cascade or os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        detector = cascade_detector(cascade, scaleFactor=args.scale_factor, minNeighbors=args.min_neighbors,
+                                    minSize=(args.min_size, args.min_size))
+
+        reference_stats, reference = run(RecordedPipeline, show=False)
+        reference_boxes = sum(len(boxes) for boxes in reference.values())
+        print(f"every frame:   {reference_stats['fps']:6.1f} FPS, {reference_stats['displayed']} frames, "
+              f"{reference_boxes} boxes (reference)")
+        for every in args.every:
+            stats, history = run(RecordedTracking, detect_every=every, show=args.show)
+            assert stats["displayed"] == reference_stats["displayed"], "the block policy must not lose frames"
+            matched, overlaps, predicted = 0, [], 0
+            for index, expected in reference.items():
+                found = history.get(index, [])
+                predicted += len(found)
+                matches = match_boxes(found, expected, args.match_iou)
+                matched += len(matches)
+                overlaps += [overlap for _, _, overlap in matches]
+            precision = matched / predicted if predicted else float("nan")
+            recall = matched / reference_boxes if reference_boxes else float("nan")
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+            print(f"every {every:2d}:      {stats['fps']:6.1f} FPS ({stats['fps'] / reference_stats['fps']:.1f}x), "
+                  f"{stats['keyframes']} keyframes ({stats['scene_changes']} scene changes), "
+                  f"precision {precision:.2f} recall {recall:.2f} F1 {f1:.2f}, "
+                  f"mean IoU {np.mean(overlaps) if overlaps else 0.0:.2f}, {stats['tracks']} track IDs")